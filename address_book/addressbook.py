@@ -1,30 +1,41 @@
 from collections import UserDict
+import itertools
 from .record import *
 from .change import *
 import warnings
 import pickle
 import os
 from datetime import datetime, timedelta
+import calendar
 from .myexception import *
+from .indexes import *
+from .journal import *
+from .exporter import *
+from .snapshot import SNAPSHOT_EXTENSION, write_snapshot
 
 
 class ABIterator:
     """
     this class represents an iterator over the records in an address book.
+    The records are taken from the collection page by page, the collection is not copied.
     """
 
-    def __init__(self, collection, n=None):
+    def __init__(self, collection, n=None, plain=False):
         """
         Initializes the iterator.
         :param collection: collection over with the iterator will iterate. Expected: dict with records.
         :param n: number of objects from the collection which have to be returned in one iteration.
                     If None, all objects will be returned at once.
+        :param plain: if True, records are rendered as plain lines instead of tables.
         """
         self.collection = None
+        self.cursor = None  # iterator over the collection
+        self.size = None  # size of the collection when the iteration started (if it has a size)
         self.set_collection(collection)
         self.n = None
         self.set_n(n)
         self.start_idx = 0
+        self.plain = plain
 
     def set_collection(self, new_collection):
         """
@@ -33,13 +44,17 @@ class ABIterator:
         """
         if not new_collection:
             self.collection = None
+            self.cursor = None
+            self.size = None
         else:
             try:
-                self.collection = list(new_collection)
+                self.cursor = iter(new_collection)
             except Exception:
                 raise ValueError(
                     f"The collection {new_collection} for iteration is not iterable."
                 )
+            self.collection = new_collection
+            self.size = len(new_collection) if hasattr(new_collection, "__len__") else None
 
     def set_n(self, new_n: int):
         """
@@ -60,23 +75,38 @@ class ABIterator:
                 f"Positive integer number is expected as a parameter for iteration, provided: '{new_n}"
             )
 
+    def check_not_modified(self):
+        """
+        Raises an exception if the size of the collection changed since the iteration started.
+        """
+        if self.size is not None and len(self.collection) != self.size:
+            self.cursor = None
+            raise MyException(
+                "The address book was modified during the iteration. Please, repeat the command."
+            )
+
     def __iter__(self):
         return self
 
     def __next__(self):
-        if not self.collection:
+        if not self.cursor:
             raise StopIteration
-        elif self.start_idx >= len(self.collection):
+        self.check_not_modified()
+        try:
+            page = list(itertools.islice(self.cursor, self.n))
+        except RuntimeError:  # a dict changed its size during the iteration
+            self.cursor = None
+            raise MyException(
+                "The address book was modified during the iteration. Please, repeat the command."
+            )
+        if not page:
+            self.cursor = None
             raise StopIteration
-        elif not self.n:
-            self.start_idx = len(self.collection)
-            return AddressBook.display_records(self.collection)
-        else:
-            end_idx = min(self.start_idx + self.n, len(self.collection))
-            res = self.collection[self.start_idx : end_idx]
-            res = AddressBook.display_records(res, self.start_idx)
-            self.start_idx = end_idx
-            return res
+        res = AddressBook.display_records(page, self.start_idx, self.plain)
+        self.start_idx += len(page)
+        if not self.n:
+            self.cursor = None
+        return res
 
 
 class AddressBook(UserDict):
@@ -84,22 +114,86 @@ class AddressBook(UserDict):
     Class representing the address book.
     """
 
+    # extension of the files the address book is stored in
+    FILE_EXTENSION = ".bin"
+
     @staticmethod
-    def display_records(data, prev_id=0):
+    def display_records(data, prev_id=0, plain=False):
+        """
+        Renders the records as a numbered list.
+        :param data: iterable with records.
+        :param prev_id: number of the records displayed before.
+        :param plain: if True, records are rendered as plain lines instead of tables.
+        :return: the records as a string.
+        """
         res = "\n\n".join(
-            f"{prev_id + pos + 1}. {record.to_string()}"
+            f"{prev_id + pos + 1}. {record.to_plain_string() if plain else record.to_string()}"
             for pos, record in enumerate(data)
         )
         return res
 
-    def __init__(self, username="defaultuser"):
+    def __init__(self, username="defaultuser", substring_index=False, journaled=False):
         """
         Initiates the AddressBook object.
         :param username: name of the owner of the address book.
+        :param substring_index: if True, n-gram indexes are maintained to speed up the search by substrings.
+        :param journaled: if True, storing appends the performed operations to a journal
+                          instead of rewriting the whole file.
         """
         super(AddressBook, self).__init__(self)
         self.username = username  # owner of the address book
         self.n = None  # number of records to be returned per one iteration
+        self.phone_index = PhoneIndex()  # phone number -> names of the records
+        self.email_index = EmailIndex()  # normalized e-mail -> names of the records
+        self.email_domain_index = EmailDomainIndex()  # e-mail domain -> names of the records
+        self.birthday_index = BirthdayIndex()  # (month, day) -> names of the records
+        self.substring_indexes = {}  # field class ('n', 'p', 'e', 'b', 'a') -> NgramIndex
+        if substring_index:
+            self.enable_substring_index()
+        self.journal = Journal() if journaled else None
+
+    def get_indexes(self, fields="npeba"):
+        """
+        Returns the indexes which have to be kept up to date with the records.
+        :param fields: field classes the returned indexes depend on (by default, all indexes are returned):
+                        n - name, p - phone numbers, e - e-mails, b - birthday, a - address.
+        :return: list of RecordIndex objects.
+        """
+        indexes = [
+            self.phone_index,
+            self.email_index,
+            self.email_domain_index,
+            self.birthday_index,
+            *self.substring_indexes.values(),
+        ]
+        return [index for index in indexes if index.field in fields]
+
+    def enable_substring_index(self):
+        """
+        Builds n-gram indexes for all field classes used by get_record_by_string.
+        The indexes are kept up to date afterwards.
+        :return: None.
+        """
+        for field in NgramIndex.FIELD_VALUES:
+            if field not in self.substring_indexes:
+                index = NgramIndex(field)
+                index.rebuild(self.data.values())
+                self.substring_indexes[field] = index
+
+    def disable_substring_index(self):
+        self.substring_indexes = {}
+
+    def index_record(self, record: Record, fields="npeba"):
+        for index in self.get_indexes(fields):
+            index.add(record)
+
+    def unindex_record(self, record: Record, fields="npeba"):
+        for index in self.get_indexes(fields):
+            index.remove(record)
+
+    def rebuild_indexes(self):
+        for index in self.get_indexes():
+            index.rebuild(self.data.values())
 
     def get_username(self):
         return self.username
@@ -131,11 +225,50 @@ class AddressBook(UserDict):
         :param record: new record to be added to the address book.
         :return: None.
         """
+        self.put_record(record)
+        if self.journal:
+            self.journal.append(Journal.ADD, record)
+
+    def add_records(self, records) -> int:
+        """
+        Adds multiple records to the address book in one pass (e.g. on import).
+        Records with the names already present overwrite the old ones without separate warnings.
+        The records are not journaled one by one: the next storing writes the full checkpoint.
+        :param records: iterable with new records.
+        :return: number of overwritten records.
+        """
+        overwritten = 0
+        indexes = self.get_indexes()
+        added = {}  # name -> record: records overwritten within the same batch are not indexed
+        for record in records:
+            name = record.get_name()
+            old_record = self.data.get(name)
+            if old_record is not None:
+                overwritten += 1
+                if name not in added:
+                    for index in indexes:
+                        index.remove(old_record)
+            self.data[name] = record
+            added[name] = record
+        for index in indexes:
+            index.add_many(added.values())
+        if self.journal and added:
+            self.journal.request_checkpoint()
+        return overwritten
+
+    def put_record(self, record: Record):
+        """
+        Stores a record under its name and indexes it. Overwrites the record with the same name.
+        :param record: record to be stored.
+        :return: None.
+        """
         if record.get_name() in self.data:
             warnings.warn(
                 f"WARNING: the record for the contact '{record.get_name()}' gets overwritten."
             )
+            self.unindex_record(self.data[record.get_name()])
         self.data[record.get_name()] = record
+        self.index_record(record)
 
     def delete_record(self, name: str):
         """
@@ -144,12 +277,15 @@ class AddressBook(UserDict):
         :return: None.
         """
         try:
-            del self.data[name]
+            record = self.data.pop(name)
+            self.unindex_record(record)
         except KeyError:
             raise MyException(
                 f"The record for the contact '{name}' cannot be deleted: this name is not in the "
                 f"address book."
             )
+        if self.journal:
+            self.journal.append(Journal.DELETE, name)
 
     def edit_record_name(self, old_name: str, new_name: str):
         """
@@ -160,13 +296,19 @@ class AddressBook(UserDict):
         """
         try:
             record = self.data.pop(old_name)
-            record.edit_name(new_name)
-            self.add_record(record)
-            return record
         except KeyError:
             raise MyException(
                 f"Cannot change the name of a record: the name '{old_name}' is not in the address book."
             )
+        self.unindex_record(record)
+        record.edit_name(new_name)
+        self.put_record(record)
+        if self.journal:
+            self.journal.append(
+                Journal.CHANGE,
+                Change(ChangeType.EDIT_NAME, name=old_name, new_name=new_name),
+            )
+        return record
 
     def edit_record(self, change: Change):
         """
@@ -178,11 +320,133 @@ class AddressBook(UserDict):
         changetype = change.get_changetype()
         kwargs = change.get_kwargs()
         record = self.get_record_by_name(name)
+        if changetype == ChangeType.EDIT_NAME:
+            return self.edit_record_name(old_name=name, new_name=kwargs["new_name"])
+        # the record is taken out of the affected indexes while it is being changed
+        fields = ChangeType.get_changed_fields(changetype)
+        self.unindex_record(record, fields)
+        try:
+            self.apply_change(record, changetype, kwargs)
+        finally:
+            self.index_record(record, fields)
+        if self.journal:
+            self.journal.append(Journal.CHANGE, change)
+        return record
+
+    def apply_changes(self, changes) -> list:
+        """
+        Applies multiple changes as one transaction: if one of the changes fails,
+        all the changes are rolled back. The indexes are updated once per changed record,
+        the batch is stored in the journal as one operation.
+        :param changes: iterable with Change objects.
+        :return: list of the changed records.
+        """
+        changes = list(changes)
+        # name -> [record stored under the name before the batch, its snapshot, fields taken out of the indexes]
+        # or None if there was no record under the name
+        saved = {}
+        order = None  # names in the book order, saved before the first rename (it moves the record to the end)
+        try:
+            for position, change in enumerate(changes):
+                if order is None and change.get_changetype() == ChangeType.EDIT_NAME:
+                    order = list(self.data)
+                self.apply_batch_change(change, position, saved)
+        except Exception:
+            self.rollback_batch(saved, order)
+            raise
+        changed = {}
+        for name, entry in saved.items():
+            if name in self.data:
+                record = self.data[name]
+                # a renamed record has to be put into all indexes under its new name
+                fields = entry[2] if entry is not None and entry[0] is record else "npeba"
+                self.index_record(record, fields)
+                changed[id(record)] = record
+        if self.journal:
+            self.journal.append(Journal.BATCH, changes)
+        return list(changed.values())
+
+    def save_for_rollback(self, name: str, fields: str, saved: dict):
+        """
+        Saves a snapshot of the record stored under the name before it gets changed within a batch
+        and takes the record out of the affected indexes until the batch is finished.
+        :param name: name of the record.
+        :param fields: field classes which are going to be changed.
+        :param saved: snapshots saved so far in the batch.
+        :return: None.
+        """
+        record = self.data.get(name)
+        if name not in saved:
+            saved[name] = None if record is None else [record, record.get_snapshot(), ""]
+        entry = saved[name]
+        if entry is None or entry[0] is not record:
+            return  # the record was put under this name within the batch, it is not indexed
+        fields = "".join(field for field in fields if field not in entry[2])
+        if fields:
+            self.unindex_record(record, fields)
+            entry[2] += fields
+
+    def apply_batch_change(self, change: Change, position: int, saved: dict):
+        name = change.get_name()
+        changetype = change.get_changetype()
+        kwargs = change.get_kwargs()
+        if name not in self.data:
+            raise MyException(
+                f"The changes were not applied: change {position + 1} failed. "
+                f"No record with the name '{name}' in the address book."
+            )
+        self.save_for_rollback(name, ChangeType.get_changed_fields(changetype), saved)
+        record = self.data[name]
+        try:
+            if changetype == ChangeType.EDIT_NAME:
+                new_name = kwargs["new_name"]
+                if new_name in self.data and new_name != name:
+                    warnings.warn(
+                        f"WARNING: the record for the contact '{new_name}' gets overwritten."
+                    )
+                self.save_for_rollback(new_name, "npeba", saved)
+                del self.data[name]
+                record.edit_name(new_name)
+                self.data[new_name] = record
+            else:
+                self.apply_change(record, changetype, kwargs)
+        except MyException as e:
+            raise MyException(
+                f"The changes were not applied: change {position + 1} failed. {e}"
+            )
+
+    def rollback_batch(self, saved: dict, order=None):
+        """
+        Restores the records saved in a batch. The records are put back into the indexes.
+        :param saved: name -> [record, snapshot, fields taken out of the indexes] or None if there was no record.
+        :param order: names of the records in the book order before the batch (needed if a record was renamed).
+        :return: None.
+        """
+        for name, entry in saved.items():
+            if entry is None:
+                self.data.pop(name, None)
+        for name, entry in saved.items():
+            if entry is not None:
+                record, snapshot, fields = entry
+                record.restore_snapshot(snapshot)
+                self.data[name] = record  # a name still present keeps its position
+                self.index_record(record, fields)
+        if order is not None:
+            # a renamed record was put back at the end of the book
+            records = [(name, self.data[name]) for name in order]
+            self.data.clear()
+            self.data.update(records)
+
+    @staticmethod
+    def apply_change(record: Record, changetype: ChangeType, kwargs: dict):
+        """
+        Performs a change of the given type on the record itself (without updating the address book).
+        :param record: record which has to be changed.
+        :param changetype: type of the change.
+        :param kwargs: key word arguments required to perform the change.
+        :return: None.
+        """
         match changetype:
-            case ChangeType.EDIT_NAME:
-                record = self.edit_record_name(
-                    old_name=name, new_name=kwargs["new_name"]
-                )
             case ChangeType.EDIT_PHONE:
                 record.edit_phone_number(**kwargs)
             case ChangeType.EDIT_EMAIL:
@@ -205,7 +469,6 @@ class AddressBook(UserDict):
                 record.remove_address()
             case _:
                 raise MyException("Change type is unknown.")
-        return record
 
     def get_record_by_name(self, name: str):
         """
@@ -226,12 +489,9 @@ class AddressBook(UserDict):
         :param phone: phone number to look for in records.
         :return: list of records which contain the specified phone number.
         """
-        res = []
         if not self.data:
             raise MyException(f"The address book is empty.")
-        for record in self.data.values():
-            if phone in record.get_phones():
-                res.append(record)
+        res = [self.data[name] for name in self.phone_index.get_names(phone)]
         if not res:
             raise MyException(
                 f"No record with the phone number '{phone}' in the address book."
@@ -240,52 +500,118 @@ class AddressBook(UserDict):
 
     def get_record_by_email(self, email: str):
         """
-        Finds all records where specified e-mail is found.
+        Finds all records where specified e-mail is found (case insensitive).
         :param email: e-mail to look for in records.
         :return: list of records which contain the specified e-mail.
         """
-        res = []
         if not self.data:
             raise MyException(f"The address book is empty.")
-        for record in self.data.values():
-            if email in record.get_emails():
-                res.append(record)
+        names = self.email_index.get_names(EmailIndex.normalize(email))
+        res = [self.data[name] for name in names]
         if not res:
             raise MyException(
                 f"No record with the e-mail '{email}' in the address book."
             )
         return res
 
+    def get_record_by_email_domain(self, domain: str):
+        """
+        Finds all records which contain an e-mail at the specified domain (case insensitive).
+        :param domain: e-mail domain to look for in records, e.g. 'gmail.com' or '@gmail.com'.
+        :return: list of records which contain an e-mail at the specified domain.
+        """
+        if not self.data:
+            raise MyException(f"The address book is empty.")
+        names = self.email_domain_index.get_names(
+            EmailDomainIndex.get_domain(domain)
+        )
+        res = [self.data[name] for name in names]
+        if not res:
+            raise MyException(
+                f"No record with an e-mail at the domain '{domain}' in the address book."
+            )
+        return res
+
     def get_record_by_birthday(self, birthday: str):
         """
         Finds all records where specified birthday date is found.
         :param birthday: birthday date to look for in records.
         :return: list of records which contain the specified birthday date.
         """
-        res = []
         if not self.data:
             raise MyException(f"The address book is empty.")
         birthday = Birthday.reformat_value(birthday)
-        for record in self.data.values():
-            if birthday == record.get_birthday():
-                res.append(record)
+        names = self.birthday_index.get_names(BirthdayIndex.get_month_day(birthday))
+        res = [self.data[name] for name in names]
         if not res:
             raise MyException(
                 f"No record with the birthday date '{birthday}' in the address book."
             )
         return res
 
+    def get_names_by_date(self, date: datetime):
+        """
+        Finds the names of all records with the birthday on the given date.
+        Birthdays on 29/02 are celebrated on 01/03 in non-leap years (as in Record.days_to_birthday).
+        :param date: date of the birthday.
+        :return: list of record names.
+        """
+        names = self.birthday_index.get_names((date.month, date.day))
+        if date.month == 3 and date.day == 1 and not calendar.isleap(date.year):
+            names += self.birthday_index.get_names((2, 29))
+        return names
+
     def get_record_by_days_till_birthday(self, n_days: str):
+        """
+        Finds all records with the birthday in exactly n_days days.
+        :param n_days: number of days till the birthday.
+        :return: list of records with the birthday in n_days days.
+        """
         try:
             n_days = int(n_days)
-            cur_day = datetime.now()
-            birthday = cur_day + timedelta(days=n_days)
-            birthday = f"{birthday.day}/{birthday.month}"
-            return self.get_record_by_birthday(birthday)
         except ValueError:
             raise MyException(
                 f"The given parameter '{n_days}' for the number of days is not a valid integer number."
             )
+        if not self.data:
+            raise MyException(f"The address book is empty.")
+        cur_day = datetime.now()
+        birthday = cur_day + timedelta(days=n_days)
+        res = [self.data[name] for name in self.get_names_by_date(birthday)]
+        if not res:
+            raise MyException(
+                f"No record with the birthday date '{birthday.day:02}/{birthday.month:02}' in the address book."
+            )
+        return res
+
+    def get_record_by_upcoming_birthdays(self, n_days: str):
+        """
+        Finds all records with the birthday within the next n_days days (today included).
+        :param n_days: number of days to look ahead.
+        :return: list of records sorted by the number of days till the birthday.
+        """
+        try:
+            n_days = int(n_days)
+            if n_days < 0:
+                raise ValueError()
+        except ValueError:
+            raise MyException(
+                f"The given parameter '{n_days}' for the number of days is not a valid non-negative integer number."
+            )
+        if not self.data:
+            raise MyException(f"The address book is empty.")
+        cur_day = datetime.now()
+        names = {}  # used as an ordered set: a birthday can be met twice within 366 days
+        # every birthday is met within one year, further days would only repeat the results
+        for days in range(min(n_days, 365) + 1):
+            date = cur_day + timedelta(days=days)
+            names.update(dict.fromkeys(self.get_names_by_date(date)))
+        res = [self.data[name] for name in names]
+        if not res:
+            raise MyException(
+                f"No record with the birthday within the next {n_days} days in the address book."
+            )
+        return res
 
     def get_record_by_string(self, substring: str, fields="np"):
         """
@@ -300,31 +626,39 @@ class AddressBook(UserDict):
                         a - for 'address'
         :return: list of records which contain the specified (sub)string.
         """
-        res = []
         if not self.data:
             raise MyException(f"The address book is empty.")
-        for record in self.data.values():
-            if "n" in fields and substring in record.get_name():
-                res.append(record)
-            elif "b" in fields and substring in record.get_birthday():
-                res.append(record)
-            elif "a" in fields and substring in record.get_address():
-                res.append(record)
-            elif "p" in fields:
-                for phone in record.get_phones():
-                    if substring in phone:
-                        res.append(record)
-                        break
-            if (record not in res) and "e" in fields:
-                for email in record.get_emails():
-                    if substring in email:
-                        res.append(record)
-                        break
-        if not res:
+        field_classes = [field for field in NgramIndex.FIELD_VALUES if field in fields]
+        names = {}  # used as an ordered set
+        scan_fields = []
+        indexed = False
+        for field in field_classes:
+            found = None
+            if field in self.substring_indexes:
+                found = self.substring_indexes[field].find(substring, self.data)
+            if found is None:
+                scan_fields.append(field)
+            else:
+                indexed = True
+                names.update(dict.fromkeys(found))
+        if scan_fields:
+            get_values = [NgramIndex.FIELD_VALUES[field] for field in scan_fields]
+            for name, record in self.data.items():
+                if name not in names and any(
+                    substring in value
+                    for get_field_values in get_values
+                    for value in get_field_values(record)
+                ):
+                    names[name] = None
+        if not names:
             raise MyException(
                 f"No record with the substring '{substring}' within the fields '{fields}' in the address book."
             )
-        return res
+        if indexed:
+            # the index returns the names in no particular order: the records are returned in the book order
+            # as without the index (only a membership check per record, the values are not scanned)
+            return [record for name, record in self.data.items() if name in names]
+        return [self.data[name] for name in names]
 
     def get_record_by_address(self, address: str):
         """
@@ -344,27 +678,90 @@ class AddressBook(UserDict):
             )
         return res
 
-    def store_to_file(self, path="", filename=""):
+    def store_to_file(self, path="", filename="", snapshot=False):
+        """
+        Stores the address book into the file "<filename>.bin" (by default, the username is used as the filename).
+        If the address book is journaled and was already stored into this file,
+        only the operations performed since the last storing are appended to the journal.
+        :param path: folder for the file.
+        :param filename: name of the file without the extension.
+        :param snapshot: if True, a read-only snapshot "<filename>.snap" is written as well (see SnapshotAddressBook),
+                        an existing snapshot is always rewritten.
+        :return: None.
+        """
         if not filename:
             filename = self.username
-        filename = os.path.join(path, filename + ".bin")
-        with open(filename, "wb") as f:
-            pickle.dump((self.data, self.username), f, pickle.HIGHEST_PROTOCOL)
+        snapshot_filename = os.path.join(path, filename + SNAPSHOT_EXTENSION)
+        # an existing snapshot is rewritten, so that it does not show outdated records
+        if snapshot or os.path.exists(snapshot_filename):
+            write_snapshot(self.data.values(), self.username, snapshot_filename)
+        filename = os.path.join(path, filename + self.FILE_EXTENSION)
+        if not self.journal:
+            with open(filename, "wb") as f:
+                pickle.dump((self.data, self.username), f, pickle.HIGHEST_PROTOCOL)
+            Journal.remove_logs(filename)
+        elif not self.journal.is_bound_to(filename) or self.journal.checkpoint_needed:
+            self.journal.bind(filename, self.journal.seq)
+            self.journal.write_checkpoint(self.data, self.username)
+        else:
+            log_size = self.journal.flush()
+            if self.journal.needs_compaction(log_size):
+                self.journal.compact(self.data, self.username)
 
     def load_from_file(self, filename):
+        """
+        Loads the address book from a file. Operations stored in the journal of the file are replayed.
+        :param filename: path of the file.
+        :return: None.
+        """
         try:
-            with open(filename, "rb") as f:
-                self.data, self.username = pickle.load(f)
+            data, username, seq = Journal.read_checkpoint(filename)
         except FileNotFoundError:
             raise MyException(
                 f"Address book cannot be loaded from the file '{filename}: the file does not exist."
             )
+        self.data, self.username = data, username
+        self.rebuild_indexes()
+        journal, self.journal = self.journal, None  # replayed operations are not journaled again
+        last_seq = seq
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                for last_seq, operation, arg in Journal.read_entries(filename, seq):
+                    match operation:
+                        case Journal.ADD:
+                            self.add_record(arg)
+                        case Journal.DELETE:
+                            self.delete_record(arg)
+                        case Journal.CHANGE:
+                            self.edit_record(arg)
+                        case Journal.BATCH:
+                            self.apply_changes(arg)
+        finally:
+            self.journal = journal
+        if self.journal:
+            self.journal.bind(filename, last_seq)
+
+    def export(self, filename: str, file_format=None, fields="npeba", records=None) -> int:
+        """
+        Exports the records into a CSV or JSON Lines file. The records are written one by one.
+        :param filename: path of the file or '-' for the standard output.
+        :param file_format: 'csv' or 'jsonl'. If None, the extension of the file is used.
+        :param fields: field classes to export: any combination of 'n', 'p', 'e', 'b', 'a'.
+        :param records: records to export (e.g. found by get_record_by_*). By default, all records are exported.
+        :return: number of exported records.
+        """
+        if records is None:
+            records = self.data.values()
+        elif type(records) == Record:
+            records = [records]
+        return export_records(records, filename, file_format, fields)
 
-    def iterator(self, n=None):
-        return ABIterator(self.data.values(), n)
+    def iterator(self, n=None, plain=False):
+        return ABIterator(self.data.values(), n, plain)
 
-    def to_string(self):
-        return AddressBook.display_records(self.data.values())
+    def to_string(self, plain=False):
+        return AddressBook.display_records(self.data.values(), plain=plain)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,204 @@
+"""
+Simple benchmarks for the address book.
+Run from the root folder of the project, e.g.:
+    python -m address_book.benchmark phone 1000 10000 100000 1000000
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from .addressbook import *
+from .importer import import_contacts
+from .snapshotbook import SnapshotAddressBook
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def make_address_book(size: int, substring_index=False) -> AddressBook:
+    """
+    Creates an address book with 'size' generated records.
+    :param size: number of records.
+    :param substring_index: if True, the address book maintains n-gram indexes.
+    :return: filled address book.
+    """
+    ab = AddressBook("benchmark", substring_index=substring_index)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for i in range(size):
+            ab.add_record(
+                Record(
+                    f"contact{i}",
+                    f"{380000000000 + i}",
+                    f"contact{i}@domain{i % 100}.com",
+                    f"{i % 28 + 1}/{i % 12 + 1}",
+                    f"street {i}",
+                )
+            )
+    return ab
+
+
+def time_per_call(fnc, args_list: list) -> float:
+    """
+    Measures the average time of one call of fnc.
+    :param fnc: function to be measured.
+    :param args_list: list of arguments; fnc is called once per element.
+    :return: average time in microseconds.
+    """
+    start = time.perf_counter()
+    for args in args_list:
+        fnc(args)
+    return (time.perf_counter() - start) / len(args_list) * 1_000_000
+
+
+def bench_phone_lookup(sizes: list):
+    print(f"{'records':>10} | {'phone lookup, us':>18}")
+    for size in sizes:
+        ab = make_address_book(size)
+        step = max(size // 1000, 1)
+        phones = [f"{380000000000 + i}" for i in range(0, size, step)]
+        print(f"{size:>10} | {time_per_call(ab.get_record_by_phone, phones):>18.2f}")
+
+
+def bench_substring_search(sizes: list):
+    print(f"{'records':>10} | {'scan, ms':>10} | {'n-gram index, ms':>16}")
+    for size in sizes:
+        ab = make_address_book(size)
+        queries = [f"{380000000000 + i}"[-7:] for i in range(0, size, max(size // 20, 1))]
+        queries += [f"contact{i}" for i in range(0, size, max(size // 20, 1))]
+        scan = time_per_call(ab.get_record_by_string, queries) / 1000
+        ab.enable_substring_index()
+        indexed = time_per_call(ab.get_record_by_string, queries) / 1000
+        print(f"{size:>10} | {scan:>10.2f} | {indexed:>16.2f}")
+
+
+def bench_store_after_edit(sizes: list):
+    print(f"{'records':>10} | {'full store, ms':>14} | {'journaled store, ms':>19}")
+    for size in sizes:
+        ab = make_address_book(size)
+        with tempfile.TemporaryDirectory() as path:
+            res = []
+            for journal in [None, Journal()]:
+                ab.journal = journal
+                ab.store_to_file(path)
+                edits = [
+                    Change(ChangeType.EDIT_ADDRESS, f"contact{i}", new_address="new")
+                    for i in range(0, size, max(size // 20, 1))
+                ]
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    start = time.perf_counter()
+                    for change in edits:
+                        ab.edit_record(change)
+                        ab.store_to_file(path)
+                res.append((time.perf_counter() - start) / len(edits) * 1000)
+        print(f"{size:>10} | {res[0]:>14.2f} | {res[1]:>19.2f}")
+
+
+def bench_show_all(sizes: list):
+    print(f"{'records':>10} | {'first, ms':>10} | {'cached, ms':>10} | {'plain, ms':>10}")
+    for size in sizes:
+        ab = make_address_book(size)
+        res = []
+        for plain in [False, False, True]:
+            start = time.perf_counter()
+            ab.to_string(plain)
+            res.append((time.perf_counter() - start) * 1000)
+        print(f"{size:>10} | {res[0]:>10.1f} | {res[1]:>10.1f} | {res[2]:>10.1f}")
+
+
+def bench_memory(sizes: list):
+    print(f"{'records':>10} | {'bytes per contact':>17} | {'with indexes':>12}")
+    for size in sizes:
+        tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+        ab = make_address_book(size)
+        with_indexes = (tracemalloc.get_traced_memory()[0] - start) / size
+        ab.phone_index = PhoneIndex()
+        ab.email_index = EmailIndex()
+        ab.email_domain_index = EmailDomainIndex()
+        ab.birthday_index = BirthdayIndex()
+        records_only = (tracemalloc.get_traced_memory()[0] - start) / size
+        tracemalloc.stop()
+        print(f"{size:>10} | {records_only:>17.0f} | {with_indexes:>12.0f}")
+
+
+def bench_import(sizes: list):
+    print(f"{'records':>10} | {'import, s':>10} | {'records/s':>10}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, "contacts.csv")
+            with open(filename, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["name", "phones", "emails", "birthday", "address"])
+                for i in range(size):
+                    writer.writerow(
+                        [
+                            f"contact{i}",
+                            f"{380000000000 + i}",
+                            f"contact{i}@domain{i % 100}.com",
+                            f"{i % 28 + 1}/{i % 12 + 1}",
+                            f"street {i}",
+                        ]
+                    )
+            ab = AddressBook("benchmark")
+            start = time.perf_counter()
+            import_contacts(ab, filename)
+            duration = time.perf_counter() - start
+        print(f"{size:>10} | {duration:>10.2f} | {size / duration:>10.0f}")
+
+
+def bench_export(sizes: list):
+    print(f"{'records':>10} | {'export, s':>10} | {'peak memory, KiB':>16}")
+    for size in sizes:
+        ab = make_address_book(size)
+        with tempfile.TemporaryDirectory() as path:
+            tracemalloc.start()
+            start = time.perf_counter()
+            ab.export(os.path.join(path, "contacts.csv"))
+            duration = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+        print(f"{size:>10} | {duration:>10.2f} | {peak:>16.0f}")
+
+
+def bench_snapshot_open(sizes: list):
+    print(f"{'records':>10} | {'load .bin, ms':>13} | {'open .snap, ms':>14}")
+    for size in sizes:
+        ab = make_address_book(size)
+        with tempfile.TemporaryDirectory() as path:
+            ab.store_to_file(path, snapshot=True)
+            res = []
+            for book, filename in [
+                (AddressBook(), "benchmark.bin"),
+                (SnapshotAddressBook(), "benchmark.snap"),
+            ]:
+                # time till the first lookup is answered
+                start = time.perf_counter()
+                book.load_from_file(os.path.join(path, filename))
+                book.get_record_by_phone(f"{380000000000 + size // 2}")
+                res.append((time.perf_counter() - start) * 1000)
+            book.snapshot.close()
+        print(f"{size:>10} | {res[0]:>13.1f} | {res[1]:>14.1f}")
+
+
+BENCHMARKS = {
+    "phone": bench_phone_lookup,
+    "substring": bench_substring_search,
+    "store": bench_store_after_edit,
+    "show": bench_show_all,
+    "memory": bench_memory,
+    "import": bench_import,
+    "export": bench_export,
+    "snapshot": bench_snapshot_open,
+}
+
+
+if __name__ == "__main__":
+    names = [arg for arg in sys.argv[1:] if not arg.isdigit()] or list(BENCHMARKS)
+    sizes = [int(arg) for arg in sys.argv[1:] if arg.isdigit()] or DEFAULT_SIZES
+    for bench_name in names:
+        print(f"BENCHMARK: {bench_name}")
+        BENCHMARKS[bench_name](sizes)
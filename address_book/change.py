@@ -8,6 +8,31 @@ class ChangeType:
     """
     EDIT_NAME, EDIT_PHONE, EDIT_EMAIL, ADD_PHONE, ADD_EMAIL, REMOVE_PHONE, REMOVE_EMAIL, EDIT_BIRTHDAY, REMOVE_BIRTHDAY, EDIT_ADDRESS, REMOVE_ADDRESS = range(11)
 
+    @staticmethod
+    def get_changed_fields(changetype) -> str:
+        """
+        Returns the fields of a record which are affected by the change type:
+        n - name, p - phone numbers, e - e-mails, b - birthday, a - address.
+        :param changetype: type of the change.
+        :return: string with the field classes.
+        """
+        return CHANGED_FIELDS.get(changetype, "npeba")
+
+
+CHANGED_FIELDS = {
+    ChangeType.EDIT_NAME: "npeba",  # the name is stored in all indexes
+    ChangeType.EDIT_PHONE: "p",
+    ChangeType.ADD_PHONE: "p",
+    ChangeType.REMOVE_PHONE: "p",
+    ChangeType.EDIT_EMAIL: "e",
+    ChangeType.ADD_EMAIL: "e",
+    ChangeType.REMOVE_EMAIL: "e",
+    ChangeType.EDIT_BIRTHDAY: "b",
+    ChangeType.REMOVE_BIRTHDAY: "b",
+    ChangeType.EDIT_ADDRESS: "a",
+    ChangeType.REMOVE_ADDRESS: "a",
+}
+
 
 class Change:
     """
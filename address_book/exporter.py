@@ -0,0 +1,128 @@
+"""
+Streaming export of address book records to CSV or JSON Lines files.
+The output is produced line by line by generators, so the whole export
+is never kept in memory.
+"""
+import contextlib
+import csv
+import io
+import json
+import sys
+from .myexception import *
+
+# columns of the CSV files (also used for the import)
+COLUMNS = ["name", "phones", "emails", "birthday", "address"]
+# separator of multiple phones/e-mails within one CSV cell
+VALUES_SEPARATOR = ";"
+# field class (as in AddressBook.get_record_by_string) -> column
+FIELD_COLUMNS = {"n": "name", "p": "phones", "e": "emails", "b": "birthday", "a": "address"}
+# file name which stands for the standard output
+STDOUT = "-"
+
+
+def get_columns(fields: str) -> list:
+    """
+    Converts the field classes to export into the columns of the output.
+    :param fields: any combination of 'n', 'p', 'e', 'b', 'a'.
+    :return: list of columns in the order of COLUMNS.
+    """
+    unknown = set(fields) - set(FIELD_COLUMNS)
+    if unknown or not fields:
+        raise MyException(
+            f"Wrong fields to export: '{fields}'. Use any combination of 'n' (name), "
+            f"'p' (phones), 'e' (e-mails), 'b' (birthday), 'a' (address)."
+        )
+    selected = {FIELD_COLUMNS[field] for field in fields}
+    return [column for column in COLUMNS if column in selected]
+
+
+def get_values(record, columns: list) -> dict:
+    values = {}
+    for column in columns:
+        match column:
+            case "name":
+                values[column] = record.get_name()
+            case "phones":
+                values[column] = record.get_phones()
+            case "emails":
+                values[column] = record.get_emails()
+            case "birthday":
+                values[column] = record.get_birthday()
+            case "address":
+                values[column] = record.get_address()
+    return values
+
+
+def to_csv_line(values: list) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(
+        VALUES_SEPARATOR.join(value) if isinstance(value, list) else value
+        for value in values
+    )
+    return buffer.getvalue()
+
+
+def csv_lines(records, columns: list):
+    yield to_csv_line(columns)
+    for record in records:
+        yield to_csv_line(get_values(record, columns).values())
+
+
+def jsonl_lines(records, columns: list):
+    for record in records:
+        yield json.dumps(get_values(record, columns), ensure_ascii=False) + "\n"
+
+
+FORMATS = {
+    "csv": csv_lines,
+    "jsonl": jsonl_lines,
+    "json": jsonl_lines,
+}
+
+
+def get_format(filename: str, file_format=None) -> str:
+    if not file_format:
+        file_format = "csv" if filename == STDOUT else filename.rsplit(".", 1)[-1]
+    file_format = file_format.lower()
+    if file_format not in FORMATS:
+        raise MyException(
+            f"Unknown export format '{file_format}'. Supported formats: {', '.join(FORMATS)}."
+        )
+    return file_format
+
+
+def export_lines(records, file_format="csv", fields="npeba"):
+    """
+    Yields the lines of the export one by one.
+    :param records: iterable with records (may be lazy, e.g. a generator).
+    :param file_format: 'csv' or 'jsonl'.
+    :param fields: field classes to export: any combination of 'n', 'p', 'e', 'b', 'a'.
+    :return: generator of lines (strings ending with a newline).
+    """
+    return FORMATS[get_format("", file_format)](records, get_columns(fields))
+
+
+def export_records(records, filename: str, file_format=None, fields="npeba") -> int:
+    """
+    Writes the records into a file line by line.
+    :param records: iterable with records.
+    :param filename: path of the file or '-' for the standard output.
+    :param file_format: 'csv' or 'jsonl'. If None, the extension of the file is used.
+    :param fields: field classes to export: any combination of 'n', 'p', 'e', 'b', 'a'.
+    :return: number of exported records.
+    """
+    file_format = get_format(filename, file_format)
+    lines = export_lines(records, file_format, fields)
+    if filename == STDOUT:
+        output = contextlib.nullcontext(sys.stdout)
+    else:
+        try:
+            output = open(filename, "w", newline="", encoding="utf-8")
+        except OSError as e:
+            raise MyException(f"The file '{filename}' cannot be written: {e}")
+    written = 0
+    with output as f:
+        for line in lines:
+            f.write(line)
+            written += 1
+    return written - 1 if file_format == "csv" else written
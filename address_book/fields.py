@@ -1,17 +1,67 @@
+import functools
 import warnings
 from .myexception import MyException
 
 
+@functools.cache
+def get_slot_names(cls) -> list:
+    """
+    Returns the names of the attributes stored in the slots of the class and its parents
+    (private names are returned mangled, as they are stored).
+    :param cls: the class.
+    :return: list of attribute names.
+    """
+    names = []
+    for klass in cls.__mro__:
+        for slot in getattr(klass, "__slots__", ()):
+            if slot.startswith("__") and not slot.endswith("__"):
+                slot = f"_{klass.__name__.lstrip('_')}{slot}"
+            names.append(slot)
+    return names
+
+
+def get_state_dict(state) -> dict:
+    """
+    Converts a pickled state to a dict: states of objects stored before the slots were introduced are dicts,
+    states of objects with slots can be tuples (dict, slots dict).
+    :param state: the pickled state.
+    :return: dict attribute name -> value.
+    """
+    if isinstance(state, tuple):
+        dict_state, slots_state = state
+        state = {**(dict_state or {}), **(slots_state or {})}
+    return state
+
+
 class Field:
     """
     Class representing a fild in a record of an address book.
     """
 
+    # the value is stored in the slots of the subclasses, which also initialize it
+    __slots__ = ()
+
     # name of the object type
     name = "field"
 
-    def __init__(self, value: str):
-        self.value = value
+    @classmethod
+    def from_validated(cls, value):
+        """
+        Creates an object from a value which was already validated (e.g. on bulk import), skipping the validation.
+        :param value: the value in the stored format.
+        :return: the new object.
+        """
+        field = cls.__new__(cls)
+        object.__setattr__(field, get_slot_names(cls)[0], value)
+        return field
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in get_slot_names(type(self))}
+
+    def __setstate__(self, state):
+        for name, value in get_state_dict(state).items():
+            if name != "name":  # the name of the object type is stored in the class
+                object.__setattr__(self, name, value)
 
     def set_value(self, new_value: str):
         self.value = new_value
@@ -34,9 +84,11 @@ class Name(Field):
     Class representing the contact name stored in a record of an address book.
     """
 
+    __slots__ = ("value",)
+    name = "name"
+
     def __init__(self, value: str):
-        super(Name, self).__init__(value)
-        self.name = "name"
+        self.value = value
 
 
 class Phone(Field):
@@ -44,11 +96,13 @@ class Phone(Field):
     Class representing a phone number within a record of an address book.
     """
 
+    __slots__ = ("__value",)
+    name = "phone"
+
     def __init__(self, value: str):
         # super(Phone, self).__init__(None)
         self.__value = None
         self.value = value
-        self.name = "phone"
 
     @property
     def value(self):
@@ -93,10 +147,11 @@ class Email(Field):
     Class representing an email within a record of an address book.
     """
 
+    __slots__ = ("value",)
+    name = "e-mail"
+
     def __init__(self, value: str):
-        super(Email, self).__init__(None)
         self.set_value(value)
-        self.name = "e-mail"
 
     def validate(self, email: str):
         """
@@ -124,8 +179,31 @@ class Email(Field):
 class Birthday(Field):
     """
     Class representing birthday info within a record of an address book.
+    The date is stored packed into one small integer: month * 32 + day.
     """
 
+    __slots__ = ("__value",)
+    name = "birthday"
+
+    @staticmethod
+    def pack(value: str) -> int:
+        """
+        Packs a birthday in the format "dd/mm" into an integer.
+        :param value: birthday as a string.
+        :return: packed birthday.
+        """
+        day, month = value.split("/")[:2]
+        return int(month) * 32 + int(day)
+
+    @staticmethod
+    def unpack(packed: int) -> str:
+        """
+        Converts a packed birthday back to the format "dd/mm".
+        :param packed: packed birthday.
+        :return: birthday as a string.
+        """
+        return f"{packed % 32:02}/{packed // 32:02}"
+
     @staticmethod
     def get_padded_number_string(cur_str: str, required_length: int):
         if len(cur_str) == required_length:
@@ -157,11 +235,29 @@ class Birthday(Field):
         # super(Birthday, self).__init__(None)
         self.__value = None
         self.value = value
-        self.name = "birthday"
 
     @property
     def value(self):
-        return self.__value
+        if self.__value is None:
+            return None
+        return self.unpack(self.__value)
+
+    @classmethod
+    def from_validated(cls, value):
+        return super(Birthday, cls).from_validated(cls.pack(value))
+
+    def get_month_day(self) -> tuple:
+        """
+        Returns the birthday as a tuple (month, day).
+        """
+        return self.__value // 32, self.__value % 32
+
+    def __setstate__(self, state):
+        state = get_state_dict(state)
+        value = state.get("_Birthday__value")
+        if isinstance(value, str):  # stored before the birthday was packed
+            state["_Birthday__value"] = self.pack(value)
+        super(Birthday, self).__setstate__(state)
 
     @value.setter
     def value(self, new_value):
@@ -170,7 +266,7 @@ class Birthday(Field):
         :param new_value: new value to be set.
         """
         if self.validate(new_value):
-            self.__value = self.reformat_value(new_value)
+            self.__value = self.pack(self.reformat_value(new_value))
         else:
             raise MyException(
                 f"The value {new_value} is not a valid birthday value. Please, provide another value in the format "
@@ -218,9 +314,11 @@ class Address(Field):
     Class representing the contact's address stored in a record of an address book.
     """
 
+    __slots__ = ("value",)
+    name = "address"
+
     def __init__(self, value: str):
-        super(Address, self).__init__(value)
-        self.name = "address"
+        self.value = value
 
 
 if __name__ == "__main__":
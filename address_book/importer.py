@@ -0,0 +1,291 @@
+"""
+Bulk import of contacts into an address book from CSV or vCard files.
+The files are read in chunks, values are validated column by column
+and the problems are collected into a summary instead of separate warnings.
+"""
+import csv
+import gc
+import re
+from .addressbook import *
+from .exporter import COLUMNS, VALUES_SEPARATOR
+
+CHUNK_SIZE = 10_000
+# number of example values stored in the summary for each problem
+MAX_EXAMPLES = 5
+
+PHONE_PATTERN = re.compile(r"\+\d{2,}|\d+")
+EMAIL_PATTERN = re.compile(r"[^@]*@[^@.]*\.[^@.]*")
+BIRTHDAY_PATTERN = re.compile(r"(\d+)/(\d+)(/.*)?")
+VCARD_BIRTHDAY_PATTERN = re.compile(r"(?:\d{4}|--)-?(\d{2})-?(\d{2})")
+# properties which are not imported and not reported: the version and the structured name (FN is used)
+VCARD_SKIPPED_PROPERTIES = ("VERSION", "N")
+MAX_DAYS = {1: 31, 2: 29, 3: 31, 4: 30, 5: 31, 6: 30, 7: 31, 8: 31, 9: 30, 10: 31, 11: 30, 12: 31}
+
+
+class ImportSummary:
+    """
+    This class collects the results of an import: numbers of imported records and of found problems.
+    """
+
+    def __init__(self):
+        self.imported = 0  # number of imported records
+        self.overwritten = 0  # number of records which replaced existing records with the same name
+        self.problems = {}  # description of the problem -> number of occurrences
+        self.examples = {}  # description of the problem -> list of example values
+
+    def add_problem(self, problem: str, value: str):
+        self.problems[problem] = self.problems.get(problem, 0) + 1
+        examples = self.examples.setdefault(problem, [])
+        if len(examples) < MAX_EXAMPLES:
+            examples.append(value)
+
+    def to_string(self):
+        lines = [f"Imported records: {self.imported} (overwritten: {self.overwritten})."]
+        for problem, count in self.problems.items():
+            examples = ", ".join(f"'{value}'" for value in self.examples[problem])
+            lines.append(f"\t{problem}: {count} (e.g. {examples})")
+        return "\n".join(lines)
+
+
+def split_values(cell: str) -> list:
+    if not cell:
+        return []
+    return [value.strip() for value in cell.split(VALUES_SEPARATOR) if value.strip()]
+
+
+def read_csv_chunks(filename: str, summary: ImportSummary, chunk_size=CHUNK_SIZE):
+    """
+    Reads contacts from a CSV file with the header "name,phones,emails,birthday,address".
+    Multiple phones/e-mails in one cell are separated by ';'. Unknown and missing columns
+    of the header are collected into the summary.
+    :param filename: path of the file.
+    :param summary: summary to collect the problems.
+    :param chunk_size: number of contacts per chunk.
+    :return: generator of chunks: lists of dicts with the keys from COLUMNS.
+    """
+    with open(filename, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        header = reader.fieldnames or []
+        for column in header:
+            if column not in COLUMNS:
+                summary.add_problem("unknown columns (ignored)", column)
+        for column in COLUMNS:
+            if column not in header:
+                summary.add_problem("missing columns", column)
+        chunk = []
+        for row in reader:
+            chunk.append(
+                {
+                    "name": (row.get("name") or "").strip(),
+                    "phones": split_values(row.get("phones")),
+                    "emails": split_values(row.get("emails")),
+                    "birthday": (row.get("birthday") or "").strip(),
+                    "address": (row.get("address") or "").strip(),
+                }
+            )
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def parse_vcard_birthday(value: str) -> str:
+    """
+    Converts a vCard birthday (e.g. "1990-08-09", "19900809" or "--0809") to the format "dd/mm".
+    Values in other formats are returned as they are.
+    """
+    match = VCARD_BIRTHDAY_PATTERN.fullmatch(value)
+    if not match:
+        return value
+    month, day = match.groups()
+    return f"{day}/{month}"
+
+
+def read_vcard_chunks(filename: str, summary: ImportSummary, chunk_size=CHUNK_SIZE):
+    """
+    Reads contacts from a vCard file. The properties FN (name), TEL, EMAIL, BDAY and ADR are used,
+    other properties are ignored. Ignored properties, lines outside BEGIN/END and vCards without END
+    are collected into the summary.
+    :param filename: path of the file.
+    :param summary: summary to collect the problems.
+    :param chunk_size: number of contacts per chunk.
+    :return: generator of chunks: lists of dicts with the keys from COLUMNS.
+    """
+    with open(filename, encoding="utf-8") as f:
+        chunk = []
+        contact = None
+        ignored = set()  # each ignored property is reported once
+        for line in f:
+            line = line.strip()
+            if not line or ":" not in line:
+                continue
+            prop, value = line.split(":", 1)
+            prop = prop.split(";")[0].upper()
+            value = value.strip()
+            if prop == "BEGIN":
+                if contact is not None:
+                    summary.add_problem("vCards without END (skipped)", contact["name"])
+                contact = {"name": "", "phones": [], "emails": [], "birthday": "", "address": ""}
+            elif contact is None:
+                summary.add_problem("lines outside BEGIN/END (ignored)", line)
+            elif prop == "END":
+                chunk.append(contact)
+                contact = None
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+            elif prop == "FN":
+                contact["name"] = value
+            elif prop == "TEL":
+                contact["phones"].append(value.replace(" ", "").replace("-", ""))
+            elif prop == "EMAIL":
+                contact["emails"].append(value)
+            elif prop == "BDAY":
+                contact["birthday"] = parse_vcard_birthday(value)
+            elif prop == "ADR":
+                contact["address"] = " ".join(part for part in value.split(";") if part)
+            elif prop not in VCARD_SKIPPED_PROPERTIES and prop not in ignored:
+                ignored.add(prop)
+                summary.add_problem("unsupported vCard properties (ignored)", prop)
+        if contact is not None:
+            summary.add_problem("vCards without END (skipped)", contact["name"])
+        if chunk:
+            yield chunk
+
+
+def validate_phones(column: list, summary: ImportSummary) -> list:
+    """
+    Validates the phones of a chunk as Phone.validate does. Invalid phones are removed.
+    :param column: list of phone lists (one list per contact).
+    :param summary: summary to collect the problems.
+    :return: column with valid phones only.
+    """
+    res = []
+    for phones in column:
+        valid = []
+        for phone in phones:
+            if not PHONE_PATTERN.fullmatch(phone):
+                summary.add_problem("invalid phone numbers (skipped)", phone)
+                continue
+            length = len(phone) - 1 if phone[0] == "+" else len(phone)
+            if length < 3 or length > 15:
+                summary.add_problem("potentially malformed phone numbers", phone)
+            if phone not in valid:
+                valid.append(phone)
+        res.append(valid)
+    return res
+
+
+def validate_emails(column: list, summary: ImportSummary) -> list:
+    """
+    Validates the e-mails of a chunk as Email.validate does. Malformed e-mails are kept.
+    :param column: list of e-mail lists (one list per contact).
+    :param summary: summary to collect the problems.
+    :return: column without duplicated e-mails within a contact.
+    """
+    res = []
+    for emails in column:
+        valid = []
+        for email in emails:
+            if not EMAIL_PATTERN.fullmatch(email):
+                summary.add_problem("malformed e-mails", email)
+            if email not in valid:
+                valid.append(email)
+        res.append(valid)
+    return res
+
+
+def validate_birthdays(column: list, summary: ImportSummary) -> list:
+    """
+    Validates the birthdays of a chunk as Birthday.validate does. Invalid birthdays are removed.
+    :param column: list of birthdays (one per contact, empty if not known).
+    :param summary: summary to collect the problems.
+    :return: column with valid birthdays only.
+    """
+    res = []
+    for birthday in column:
+        match = BIRTHDAY_PATTERN.fullmatch(birthday) if birthday else None
+        if birthday and not (
+            match
+            and 1 <= int(match.group(2)) <= 12
+            and 1 <= int(match.group(1)) <= MAX_DAYS[int(match.group(2))]
+        ):
+            summary.add_problem("invalid birthdays (skipped)", birthday)
+            birthday = ""
+        res.append(birthday)
+    return res
+
+
+def make_records(chunk: list, summary: ImportSummary) -> list:
+    """
+    Validates a chunk of contacts column by column and creates the records.
+    :param chunk: list of dicts with the keys from COLUMNS.
+    :param summary: summary to collect the problems.
+    :return: list of records.
+    """
+    chunk = [contact for contact in chunk if contact["name"]]
+    phones = validate_phones([contact["phones"] for contact in chunk], summary)
+    emails = validate_emails([contact["emails"] for contact in chunk], summary)
+    birthdays = validate_birthdays([contact["birthday"] for contact in chunk], summary)
+    records = []
+    # the values are already validated: the fields are created without the validation
+    for contact, contact_phones, contact_emails, birthday in zip(
+        chunk, phones, emails, birthdays
+    ):
+        record = Record(contact["name"])
+        record.phones.extend(Phone.from_validated(phone) for phone in contact_phones)
+        record.emails.extend(Email.from_validated(email) for email in contact_emails)
+        if birthday:
+            record.birthday = Birthday.from_validated(birthday)
+        if contact["address"]:
+            record.address = Address(contact["address"])
+        records.append(record)
+    return records
+
+
+READERS = {
+    "csv": read_csv_chunks,
+    "vcf": read_vcard_chunks,
+    "vcard": read_vcard_chunks,
+}
+
+
+def import_contacts(address_book, filename: str, file_format=None, chunk_size=CHUNK_SIZE):
+    """
+    Imports contacts from a file into the address book.
+    :param address_book: AddressBook or SQLiteAddressBook.
+    :param filename: path of the file.
+    :param file_format: 'csv' or 'vcf'. If None, the extension of the file is used.
+    :param chunk_size: number of contacts read and validated at once.
+    :return: ImportSummary.
+    """
+    if not file_format:
+        file_format = filename.rsplit(".", 1)[-1]
+    file_format = file_format.lower()
+    if file_format not in READERS:
+        raise MyException(
+            f"Unknown import format '{file_format}'. Supported formats: {', '.join(READERS)}."
+        )
+    summary = ImportSummary()
+    # the garbage collector would repeatedly scan all the new objects, none of them is garbage
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for chunk in READERS[file_format](filename, summary, chunk_size):
+            skipped = len(chunk)
+            records = make_records(chunk, summary)
+            for _ in range(skipped - len(records)):
+                summary.add_problem("contacts without a name (skipped)", "")
+            summary.overwritten += address_book.add_records(records)
+            summary.imported += len(records)
+    except FileNotFoundError:
+        raise MyException(f"The file '{filename}' does not exist.")
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        raise MyException(
+            f"The file '{filename}' cannot be read ({e}). Records imported before the error: {summary.imported}."
+        )
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return summary
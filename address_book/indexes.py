@@ -0,0 +1,227 @@
+"""
+These classes are required to perform fast lookups of records in the address book.
+"""
+from .myexception import MyException
+
+
+class RecordIndex:
+    """
+    Base class for an index which maps keys extracted from the records
+    of an address book to the names of the records containing them.
+    """
+
+    # field class the keys are extracted from: n - name, p - phones, e - e-mails, b - birthday, a - address
+    field = None
+
+    def __init__(self):
+        # key -> names of the records containing the key (dict is used as an ordered set)
+        self.data = {}
+
+    def get_keys(self, record) -> list:
+        """
+        Returns the keys under which the given record has to be stored in the index.
+        Has to be overridden in subclasses.
+        :param record: record to be indexed.
+        :return: list of keys.
+        """
+        return []
+
+    def add(self, record):
+        """
+        Adds the record to the index.
+        :param record: record to be added.
+        :return: None.
+        """
+        name = record.get_name()
+        for key in self.get_keys(record):
+            self.data.setdefault(key, {})[name] = None
+
+    def add_many(self, records):
+        """
+        Adds multiple records to the index (faster than adding them one by one).
+        :param records: iterable with records.
+        :return: None.
+        """
+        data = self.data
+        get_keys = self.get_keys
+        for record in records:
+            name = record.get_name()
+            for key in get_keys(record):
+                names = data.get(key)
+                if names is None:
+                    data[key] = {name: None}
+                else:
+                    names[name] = None
+
+    def remove(self, record):
+        """
+        Removes the record from the index. Must be called before the record
+        (or its name) gets changed, so that the same keys are computed.
+        :param record: record to be removed.
+        :return: None.
+        """
+        name = record.get_name()
+        for key in self.get_keys(record):
+            names = self.data.get(key)
+            if names is None:
+                continue
+            names.pop(name, None)
+            if not names:
+                del self.data[key]
+
+    def get_names(self, key) -> list:
+        """
+        Returns the names of all records stored under the given key.
+        :param key: key to look for.
+        :return: list of record names (empty if the key is not in the index).
+        """
+        return list(self.data.get(key, ()))
+
+    def clear(self):
+        self.data = {}
+
+    def rebuild(self, records):
+        """
+        Fills the index from scratch with the given records.
+        :param records: iterable with records.
+        :return: None.
+        """
+        self.clear()
+        self.add_many(records)
+
+
+class PhoneIndex(RecordIndex):
+    """
+    Index mapping phone numbers to the records which contain them.
+    """
+
+    field = "p"
+
+    def get_keys(self, record) -> list:
+        return record.get_phones()
+
+
+class EmailIndex(RecordIndex):
+    """
+    Index mapping case-normalized e-mails to the records which contain them.
+    """
+
+    field = "e"
+
+    @staticmethod
+    def normalize(email: str) -> str:
+        return email.strip().lower()
+
+    def get_keys(self, record) -> list:
+        return [self.normalize(email) for email in record.get_emails()]
+
+
+class EmailDomainIndex(RecordIndex):
+    """
+    Index mapping case-normalized e-mail domains to the records which contain e-mails at these domains.
+    """
+
+    field = "e"
+
+    @staticmethod
+    def get_domain(email: str) -> str:
+        return EmailIndex.normalize(email).rpartition("@")[2]
+
+    def get_keys(self, record) -> list:
+        return [self.get_domain(email) for email in record.get_emails()]
+
+
+class BirthdayIndex(RecordIndex):
+    """
+    Index mapping birthday dates as (month, day) to the records with these birthdays.
+    """
+
+    field = "b"
+
+    @staticmethod
+    def get_month_day(birthday: str) -> tuple:
+        """
+        Converts a birthday stored in the format "dd/mm" to a tuple (month, day).
+        :param birthday: birthday as a string.
+        :return: tuple (month, day).
+        """
+        try:
+            day, month = birthday.split("/")[:2]
+            return int(month), int(day)
+        except ValueError:
+            raise MyException(f"The birthday date '{birthday}' is not well-formed.")
+
+    def get_keys(self, record) -> list:
+        if not record.birthday:
+            return []
+        return [record.birthday.get_month_day()]
+
+
+class NgramIndex(RecordIndex):
+    """
+    Index mapping n-grams (trigrams by default) of the values of one field class
+    to the records which contain them. Used to find candidates for substring search.
+    """
+
+    # field class (as in AddressBook.get_record_by_string) -> function returning the values of the field
+    FIELD_VALUES = {
+        "n": lambda record: [record.get_name()],
+        "p": lambda record: record.get_phones(),
+        "e": lambda record: record.get_emails(),
+        "b": lambda record: [record.get_birthday()],
+        "a": lambda record: [record.get_address()],
+    }
+
+    def __init__(self, field: str, n=3):
+        """
+        Initiates the index.
+        :param field: field class to be indexed: 'n', 'p', 'e', 'b' or 'a'.
+        :param n: length of the n-grams.
+        """
+        super(NgramIndex, self).__init__()
+        self.field = field
+        self.n = n
+        self.get_values = NgramIndex.FIELD_VALUES[field]
+
+    def get_ngrams(self, value: str) -> set:
+        return {value[i : i + self.n] for i in range(len(value) - self.n + 1)}
+
+    def get_keys(self, record) -> list:
+        keys = set()
+        for value in self.get_values(record):
+            keys |= self.get_ngrams(value)
+        return list(keys)
+
+    def get_candidates(self, substring: str):
+        """
+        Returns the names of the records which contain all n-grams of the substring.
+        The candidates still have to be verified.
+        :param substring: string to look for.
+        :return: set of record names or None if the substring is too short for the index.
+        """
+        ngrams = self.get_ngrams(substring)
+        if not ngrams:
+            return None
+        postings = sorted((self.data.get(ngram, {}) for ngram in ngrams), key=len)
+        candidates = set(postings[0])
+        for names in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(names)
+        return candidates
+
+    def find(self, substring: str, records: dict):
+        """
+        Finds the names of the records with the substring in the indexed field.
+        :param substring: string to look for.
+        :param records: records of the address book (name -> record) to verify the candidates.
+        :return: set of record names or None if the substring is too short for the index.
+        """
+        candidates = self.get_candidates(substring)
+        if candidates is None:
+            return None
+        return {
+            name
+            for name in candidates
+            if any(substring in value for value in self.get_values(records[name]))
+        }
@@ -0,0 +1,226 @@
+"""
+These classes are required to store the address book as a checkpoint plus a journal of changes.
+"""
+import os
+import pickle
+import threading
+from .myexception import *
+
+
+class Journal:
+    """
+    This class represents an append-only journal of the operations performed on an address book.
+    The address book is stored as a checkpoint file ("<username>.bin", the same format
+    as the full storage) and a log file ("<username>.journal") with the operations
+    performed after the checkpoint was written. Each operation has a sequence number,
+    the checkpoint stores the number of the last operation it contains.
+    """
+
+    # operation types stored in the journal
+    ADD, DELETE, CHANGE, BATCH = "add", "delete", "change", "batch"
+    LOG_SUFFIX = ".journal"
+    OLD_LOG_SUFFIX = ".journal.old"
+
+    @staticmethod
+    def get_log_paths(checkpoint_path: str) -> list:
+        """
+        Returns the paths of the log files belonging to the checkpoint, in the order they have to be replayed.
+        :param checkpoint_path: path of the checkpoint file.
+        :return: list of paths.
+        """
+        root = os.path.splitext(checkpoint_path)[0]
+        return [root + Journal.OLD_LOG_SUFFIX, root + Journal.LOG_SUFFIX]
+
+    @staticmethod
+    def remove_logs(checkpoint_path: str):
+        """
+        Removes the log files of the checkpoint (e.g. when the checkpoint is overwritten by a full storage).
+        :param checkpoint_path: path of the checkpoint file.
+        :return: None.
+        """
+        for log_path in Journal.get_log_paths(checkpoint_path):
+            if os.path.exists(log_path):
+                os.remove(log_path)
+
+    @staticmethod
+    def read_checkpoint(checkpoint_path: str) -> tuple:
+        """
+        Reads the checkpoint file. Files written without a journal are supported as well.
+        :param checkpoint_path: path of the checkpoint file.
+        :return: tuple (data, username, sequence number of the last operation in the checkpoint).
+        """
+        with open(checkpoint_path, "rb") as f:
+            content = pickle.load(f)
+        if len(content) == 2:
+            return content[0], content[1], 0
+        return content
+
+    @staticmethod
+    def read_entries(checkpoint_path: str, after_seq: int):
+        """
+        Yields the operations stored in the log files of the checkpoint.
+        A truncated operation at the end of a log (e.g. after a crash) is ignored.
+        :param checkpoint_path: path of the checkpoint file.
+        :param after_seq: only operations with a greater sequence number are returned.
+        :return: generator of tuples (sequence number, operation type, operation argument).
+        """
+        for log_path in Journal.get_log_paths(checkpoint_path):
+            if not os.path.exists(log_path):
+                continue
+            with open(log_path, "rb") as f:
+                while True:
+                    try:
+                        seq, operation, arg = pickle.load(f)
+                    except (EOFError, pickle.UnpicklingError):
+                        break
+                    if seq > after_seq:
+                        yield seq, operation, arg
+
+    def __init__(self, compaction_threshold=4 * 1024 * 1024):
+        """
+        Initiates the journal.
+        :param compaction_threshold: size of the log file in bytes after which the checkpoint gets rewritten.
+        """
+        self.checkpoint_path = None  # checkpoint file the journal belongs to
+        self.compaction_threshold = compaction_threshold
+        self.seq = 0  # sequence number of the last operation
+        self.pending = []  # serialized operations which are not written to the log yet
+        self.checkpoint_needed = False  # if True, the next storing writes the full checkpoint
+        self.compaction = None  # thread rewriting the checkpoint
+        self.compaction_error = None
+
+    def append(self, operation: str, arg):
+        """
+        Adds a new operation to the journal. The operation is serialized immediately,
+        so later changes of the argument do not affect it.
+        :param operation: type of the operation: Journal.ADD, Journal.DELETE, Journal.CHANGE or Journal.BATCH.
+        :param arg: argument of the operation: record, name, Change object or list of Change objects.
+        :return: None.
+        """
+        self.seq += 1
+        self.pending.append(
+            pickle.dumps((self.seq, operation, arg), pickle.HIGHEST_PROTOCOL)
+        )
+
+    def request_checkpoint(self):
+        """
+        Makes the next storing write the full checkpoint instead of appending to the log
+        (e.g. after a bulk import: its records are not kept in memory as pending operations).
+        :return: None.
+        """
+        self.checkpoint_needed = True
+        self.pending = []
+
+    def is_bound_to(self, checkpoint_path: str) -> bool:
+        return self.checkpoint_path == checkpoint_path and os.path.exists(
+            checkpoint_path
+        )
+
+    def bind(self, checkpoint_path: str, seq: int):
+        """
+        Binds the journal to a checkpoint which contains all operations up to 'seq'.
+        :param checkpoint_path: path of the checkpoint file.
+        :param seq: sequence number of the last operation.
+        :return: None.
+        """
+        self.wait_for_compaction()
+        self.checkpoint_path = checkpoint_path
+        self.seq = seq
+        self.pending = []
+
+    def flush(self):
+        """
+        Appends the pending operations to the log file.
+        :return: size of the log file in bytes.
+        """
+        log_path = self.get_log_paths(self.checkpoint_path)[1]
+        if not self.pending:
+            # no empty log file is created when nothing was changed
+            return os.path.getsize(log_path) if os.path.exists(log_path) else 0
+        with open(log_path, "ab") as f:
+            f.write(b"".join(self.pending))
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        self.pending = []
+        return size
+
+    def needs_compaction(self, log_size: int) -> bool:
+        return log_size > self.compaction_threshold and (
+            self.compaction is None or not self.compaction.is_alive()
+        )
+
+    def write_checkpoint(self, data, username):
+        """
+        Writes the full checkpoint synchronously and removes the logs.
+        :param data: records of the address book.
+        :param username: owner of the address book.
+        :return: None.
+        """
+        self.wait_for_compaction()
+        snapshot = pickle.dumps((data, username, self.seq), pickle.HIGHEST_PROTOCOL)
+        self.write_file(self.checkpoint_path, snapshot)
+        self.remove_logs(self.checkpoint_path)
+        self.pending = []
+        self.checkpoint_needed = False
+
+    def compact(self, data, username):
+        """
+        Rewrites the checkpoint: the address book is serialized in the calling thread (the records may be changed
+        right after the call, so they cannot be read later), only the writing of the file runs in a background thread.
+        The current log is renamed and kept until the new checkpoint is written,
+        new operations are appended to a new log.
+        :param data: records of the address book.
+        :param username: owner of the address book.
+        :return: None.
+        """
+        self.wait_for_compaction()
+        old_log_path, log_path = self.get_log_paths(self.checkpoint_path)
+        if os.path.exists(old_log_path):
+            # a previous compaction failed: its log must not be overwritten
+            self.write_checkpoint(data, username)
+            return
+        snapshot = pickle.dumps((data, username, self.seq), pickle.HIGHEST_PROTOCOL)
+        os.replace(log_path, old_log_path)
+        self.compaction = threading.Thread(
+            target=self.write_compacted_checkpoint,
+            args=(self.checkpoint_path, snapshot, old_log_path),
+        )
+        self.compaction.start()
+
+    def write_compacted_checkpoint(self, checkpoint_path, snapshot, old_log_path):
+        try:
+            self.write_file(checkpoint_path, snapshot)
+            os.remove(old_log_path)
+        except OSError as e:
+            self.compaction_error = e
+
+    def wait_for_compaction(self):
+        """
+        Waits until the running compaction (if any) is finished.
+        Raises an exception if the compaction failed.
+        :return: None.
+        """
+        if self.compaction is not None:
+            self.compaction.join()
+            self.compaction = None
+        if self.compaction_error is not None:
+            error, self.compaction_error = self.compaction_error, None
+            raise MyException(
+                f"The checkpoint '{self.checkpoint_path}' could not be rewritten: {error}"
+            )
+
+    @staticmethod
+    def write_file(filename: str, content: bytes):
+        """
+        Atomically replaces the file content: writes a temporary file and renames it.
+        :param filename: path of the file.
+        :param content: new content.
+        :return: None.
+        """
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
@@ -1,14 +1,31 @@
 from .addressbook import *
+from .sqlitebook import *
+from .snapshotbook import *
+from .importer import import_contacts
+import contextlib
+import io
+import json
 import os
+import sys
+import time
 import warnings
 from prettytable import PrettyTable
+from dispatcher import CommandTrie
 
 ADDRESSBOOK = None  # AddressBook()
 WARNING_COLOR = "\033[93m"  # '\033[92m' #'\033[93m'
 RESET_COLOR = "\033[0m"
 PROMPT = "AddressBook:"
+SUBSTRING_INDEX = False  # if True, n-gram indexes are used for 'find -in-<args>'
+JOURNALED_STORAGE = False  # if True, 'store' appends the changes to a journal "<user>.journal" instead of rewriting
+# the file; the "<user>.bin" file then holds a checkpoint (data, username, sequence number) instead of (data, username)
+STORAGE_BACKEND = "pickle"  # "pickle" - AddressBook in memory, "sqlite" - SQLiteAddressBook in a database file
 
 IDX_STRING = "idx="
+PLAIN_STRING = "-plain"
+SNAPSHOT_STRING = "-snapshot"
+BATCH_STRING = "--batch"
+COMMENT_STRING = "#"  # lines starting with it are skipped in the batch mode
 WARNING_WRONG_N_PER_PAGE = (
     f"Parameter for the number of records per page should be a positive integer. Parameter "
     f"which was given: "
@@ -111,8 +128,11 @@ INSTRUCTION_FIND = (
     "\tfind -n <name> (<n>)\t\t-\tto find the record with the contact name <name>\n"
     "\tfind -p <phone> (<n>)\t\t-\tto find the record(s) with the phone number <phone>\n"
     "\tfind -e <email> (<n>)\t\t-\tto find the record(s) with the e-mail <email>\n"
+    "\tfind -d <domain> (<n>)\t\t-\tto find the record(s) with an e-mail at the domain <domain>\n"
     "\tfind -b <birthday> (<n>)\t-\tto find the record(s) with the birthday <birthday> (format: day/month)\n"
     "\tfind -b-days <N> (<n>)\t\t-\tto find the record(s) with the birthday in <N> days (format: integer)\n"
+    "\tfind -b-next <N> (<n>)\t\t-\tto find the record(s) with the birthday within the next <N> days,\n"
+    "\t\t\t\t\t\t\t\t\tsorted by the number of days till birthday (format: integer)\n"
     "\tfind -a <address> \t\t\t-\tto find the record(s) with the address <address>\n"
     "\tfind -in-<args> <str> (<n>)\t-\tto find the record(s) with the substring <str> in the contact info,\n"
     "\t\t\t\t\t\t\t\t\t<args> can be any combination of characters where:\n"
@@ -121,6 +141,13 @@ INSTRUCTION_FIND = (
     "\t(The optional parameter <n> specifies the maximum number of records to be displayed at once.)"
 )
 
+INSTRUCTION_EXPORT = (
+    "\texport <path> (csv|jsonl) (-fields <args>) (<find parameters>)\n"
+    "\t(Use '-' as <path> to write to the standard output. <args> can be any combination of characters\n"
+    "\t'n' (name), 'p' (phones), 'e' (e-mails), 'b' (birthday), 'a' (address); the records can be\n"
+    "\tfiltered with the parameters of the command 'find', e.g. 'export contacts.csv -d gmail.com'.)"
+)
+
 HELP_STRING = (
     "This programme supports the following commands\n"
     f"{SYNATAX_INFO}:\n"
@@ -140,25 +167,33 @@ HELP_STRING = (
     "8.\tShowing saved birthday info for a given contact:\n"
     "\tbirthday <name>\n"
     "9.\tShowing all records in the address book:\n"
-    "\tshow all (<n>)\n"
-    "\t(The optional parameter <n> specifies the maximum number of records to be displayed at once.)\n"
+    "\tshow all (<n>) (-plain)\n"
+    "\t(The optional parameter <n> specifies the maximum number of records to be displayed at once,\n"
+    "\t'-plain' displays the records as plain lines instead of tables.)\n"
     "10.\tShowing the name of the current address book owner (user name, also used to store the address book):\n"
     "\tusername\n"
     "11.\tChanging the owner name of the current address book:\n"
     "\tnew username <username>\n"
     "12.\tStoring current address book into a file (under the current user name):\n"
-    "\tstore\n"
+    "\tstore (-snapshot)\n"
+    "\t('-snapshot' writes a read-only snapshot as well: it opens instantly even for large address books)\n"
     "13.\tLoading an address book from a file:\n"
-    "\tload <username>\n"
+    "\tload <username> (-snapshot)\n"
+    "\t('-snapshot' opens the read-only snapshot of the address book)\n"
     "14.\tCreating a new empty address book (with default or provided user name):\n"
     "\tnew profile (<username>)\n"
-    "15.\tExiting the Address Book and going back to the main menu\n"
+    "15.\tImporting contacts from a CSV file (columns: name,phones,emails,birthday,address;\n"
+    "\tmultiple phones/e-mails separated by ';') or a vCard file:\n"
+    "\timport <path> (csv|vcf)\n"
+    "16.\tExporting contacts into a CSV or JSON Lines file:\n"
+    f"{INSTRUCTION_EXPORT}\n"
+    "17.\tExiting the Address Book and going back to the main menu\n"
     "\t(executes storing as in 12. beforehand):\n"
     "\tgood bye\n"
     "\tclose\n"
     "\texit\n"
     "\tmainmenu\n"
-    "16.\tGetting help:\n"
+    "18.\tGetting help:\n"
     "\thelp\n"
     "\nAll commands are case insensitive."
 )
@@ -175,8 +210,11 @@ def exit_handler(*args):
     """
     Handles programme performance by exiting.
     """
-    res = store_handler(args)
     global ADDRESSBOOK
+    if type(ADDRESSBOOK) == SnapshotAddressBook:
+        res = "The snapshot was opened read-only: nothing was stored."
+    else:
+        res = store_handler([])
     ADDRESSBOOK = None
     return f"{res}\nYou are leaving the ADDRESS BOOK. See you again later!"
 
@@ -324,16 +362,15 @@ def edit_handler(args):
     return f"The record was successfully edited. Updated record:\n{record.to_string()}"
 
 
-def find_handler(args):
+def find_records(args) -> tuple:
     """
-    Finds a record/records in the address book: by name, phone number, e-mail, birthday date
-    or the number of days till birthday.
-    :param args: parameters to find the record(s).
-    :return: the string representing the record(s).
+    Finds a record/records in the address book by the search parameters of the command 'find'.
+    :param args: search parameter (e.g. '-p') and the value to look for.
+    :return: tuple (description of the search parameter, found record or records).
     """
     if (
         len(args) < 2
-        or args[0].lower() not in ["-n", "-p", "-e", "-b", "-b-days", "-a"]
+        or args[0].lower() not in ["-n", "-p", "-e", "-d", "-b", "-b-days", "-b-next", "-a"]
         and not args[0].lower().startswith("-in-")
     ):
         raise MyException(
@@ -349,12 +386,18 @@ def find_handler(args):
         case "-e":
             param = "e-mail"
             res = ADDRESSBOOK.get_record_by_email(args[1])
+        case "-d":
+            param = "e-mail domain"
+            res = ADDRESSBOOK.get_record_by_email_domain(args[1])
         case "-b":
             param = "birthday date"
             res = ADDRESSBOOK.get_record_by_birthday(args[1])
         case "-b-days":
             param = "number of days till birthdays"
             res = ADDRESSBOOK.get_record_by_days_till_birthday(args[1])
+        case "-b-next":
+            param = "number of days till birthdays"
+            res = ADDRESSBOOK.get_record_by_upcoming_birthdays(args[1])
         case "-a":
             param = "address"
             res = ADDRESSBOOK.get_record_by_address(" ".join(args[1:]))
@@ -362,6 +405,17 @@ def find_handler(args):
             param = "substring"
             search_args = args[0].lower()[len("-in-") :]
             res = ADDRESSBOOK.get_record_by_string(args[1], search_args)
+    return param, res
+
+
+def find_handler(args):
+    """
+    Finds a record/records in the address book: by name, phone number, e-mail, birthday date
+    or the number of days till birthday.
+    :param args: parameters to find the record(s).
+    :return: the string representing the record(s).
+    """
+    param, res = find_records(args)
     if not res:
         return f"No record with the {param} '{args[1]}' found."
     elif type(res) == Record:
@@ -450,16 +504,18 @@ def birthday_handler(args):
 def show_all_handler(args):
     """
     Handles showing all records in the address book.
-    :param args: no parameters expected.
+    :param args: optional number of records per page and/or '-plain' for plain output.
     :return: string representing all the contacts in the address book.
     """
+    plain = PLAIN_STRING in [arg.lower() for arg in args]
+    args = [arg for arg in args if arg.lower() != PLAIN_STRING]
     if len(args) > 0:
         try:
-            iterator = ADDRESSBOOK.iterator(args[0])
+            iterator = ADDRESSBOOK.iterator(args[0], plain)
             return iterator
         except MyIteratorNException:
             warnings.warn(WARNING_WRONG_N_PER_PAGE + f"'{args[0]}' (ignored).")
-    res = ADDRESSBOOK.to_string()
+    res = ADDRESSBOOK.to_string(plain)
     if not res:
         res = "Address book is empty."
     return res
@@ -489,7 +545,12 @@ def set_username_handler(args):
 
 def new_profile_handler(args=[]):
     global ADDRESSBOOK
-    ADDRESSBOOK = AddressBook()
+    if STORAGE_BACKEND == "sqlite":
+        ADDRESSBOOK = SQLiteAddressBook()
+    else:
+        ADDRESSBOOK = AddressBook(
+            substring_index=SUBSTRING_INDEX, journaled=JOURNALED_STORAGE
+        )
     if len(args) > 0:
         ADDRESSBOOK.set_username(args[0])
     return (
@@ -501,34 +562,88 @@ def store_handler(args):
     """
     Stores current address book into a binary file in the folder "users".
     By default, the current username will be used as the filename.
-    :param args: not needed.
+    :param args: optionally '-snapshot' to write a read-only snapshot of the address book as well.
     :return: confirmation of the storage.
     """
     path = "./address_book/users"
     if not os.path.exists(path):
         os.makedirs(path)
-    ADDRESSBOOK.store_to_file(path=path)
+    snapshot = any(arg.lower() == SNAPSHOT_STRING for arg in args)
+    ADDRESSBOOK.store_to_file(path=path, snapshot=snapshot)
     return f"The address book for the user '{ADDRESSBOOK.get_username()}' was successfully stored."
 
 
 def load_handler(args):
     """
     Loads an address book from a file. The must be in the folder "users" in the current directory.
-    :param args: username whose address book has to be loaded.
+    :param args: username whose address book has to be loaded, optionally '-snapshot'
+                to open the read-only snapshot of the address book.
     :return: confirmation of the loading.
     """
+    global ADDRESSBOOK
     if len(args) < 1:
         raise MyException("Please, specify the username.")
     name = args[0]
-    filename = name + ".bin"
+    snapshot = len(args) > 1 and args[1].lower() == SNAPSHOT_STRING
+    if snapshot:
+        extensions = [SnapshotAddressBook.FILE_EXTENSION]
+    elif STORAGE_BACKEND == "sqlite":
+        # address books stored by AddressBook ('.bin') get imported if there is no database yet
+        extensions = [SQLiteAddressBook.FILE_EXTENSION, AddressBook.FILE_EXTENSION]
+    else:
+        extensions = [AddressBook.FILE_EXTENSION]
     folder = "./address_book/users"
-    if not os.path.exists(folder) or filename not in os.listdir(folder):
-        # if folder not in os.listdir() or filename not in os.listdir(folder):
+    stored = os.listdir(folder) if os.path.exists(folder) else []
+    filename = next((name + ext for ext in extensions if name + ext in stored), None)
+    if filename is None:
         raise MyException(f"No address book stored for the user '{name}'")
+    if snapshot:
+        ADDRESSBOOK = SnapshotAddressBook(os.path.join(folder, filename))
+        return f"Snapshot of the address book for the user '{name}' successfully opened (read-only)."
+    if type(ADDRESSBOOK) == SnapshotAddressBook:
+        new_profile_handler()
     ADDRESSBOOK.load_from_file(os.path.join(folder, filename))
     return f"Address book for the user '{name}' successfully loaded."
 
 
+def import_handler(args):
+    """
+    Imports contacts from a CSV or vCard file into the address book.
+    :param args: path of the file and optionally its format ('csv' or 'vcf').
+    :return: summary of the import.
+    """
+    if len(args) < 1:
+        raise MyException("Please, specify the file to import.")
+    file_format = args[1] if len(args) > 1 else None
+    summary = import_contacts(ADDRESSBOOK, args[0], file_format)
+    return summary.to_string()
+
+
+def export_handler(args):
+    """
+    Exports the records of the address book into a CSV or JSON Lines file (or to the standard output).
+    :param args: path of the file ('-' for the standard output), optionally the format ('csv' or 'jsonl'),
+                the fields to export ('-fields <args>') and the search parameters as in the command 'find'.
+    :return: number of exported records.
+    """
+    if len(args) < 1:
+        raise MyException(f"Please, specify the file to export to, e.g.:\n{INSTRUCTION_EXPORT}")
+    filename, args = args[0], args[1:]
+    file_format = None
+    if args and args[0].lower() in FORMATS:
+        file_format, args = args[0], args[1:]
+    fields = "npeba"
+    if args and args[0].lower() == "-fields":
+        if len(args) < 2:
+            raise MyException(f"Please, specify the fields to export, e.g.:\n{INSTRUCTION_EXPORT}")
+        fields, args = args[1].lower(), args[2:]
+    records = find_records(args)[1] if args else None
+    exported = ADDRESSBOOK.export(filename, file_format, fields, records)
+    if filename == STDOUT:
+        return ""
+    return f"{exported} record(s) exported to '{filename}'."
+
+
 def help_handler(args):
     return HELP_STRING
 
@@ -552,6 +667,8 @@ COMMANDS = {
     new_profile_handler: ["new profile"],  # creating a new empty address book
     store_handler: ["store"],  # storing current address book into a file
     load_handler: ["load"],  # loading an address book from a file
+    import_handler: ["import"],  # importing contacts from a CSV or vCard file
+    export_handler: ["export"],  # exporting contacts into a CSV or JSON Lines file
     exit_handler: [
         "good bye",
         "close",
@@ -562,16 +679,11 @@ COMMANDS = {
 }
 
 
+COMMAND_TRIE = CommandTrie(COMMANDS)
+
+
 def command_parser(raw_str: str) -> (callable, list):
-    case_insensitive = raw_str.lower()
-    for handler, commands in COMMANDS.items():
-        for command in commands:
-            if case_insensitive == command or case_insensitive.startswith(
-                command + " "
-            ):
-                args = raw_str[len(command) :].split()
-                return handler, args
-    return None, None
+    return COMMAND_TRIE.parse(raw_str)
 
 
 def input_error(fnc):
@@ -619,6 +731,77 @@ def main_internal():
             break
 
 
+def execute_command(u_input: str) -> dict:
+    """
+    Executes one command without any interaction with the user.
+    Pages of the results are all collected, the output printed by the handler is added to the result.
+    :param u_input: command as it would be entered by the user.
+    :return: dictionary with the command status ('ok', 'error' or 'unknown'), result, warnings and latency in ms.
+    """
+    start = time.perf_counter()
+    res = {"command": u_input, "status": "ok", "result": "", "warnings": []}
+    output = io.StringIO()
+    with warnings.catch_warnings(record=True) as warning_list:
+        warnings.simplefilter("always")
+        func, data = command_parser(u_input)
+        try:
+            if not func:
+                res["status"] = "unknown"
+                res["result"] = "The command is not defined."
+            else:
+                with contextlib.redirect_stdout(output):
+                    result = func(data)
+                    if isinstance(result, ABIterator):
+                        result = "\n".join(result)
+                res["result"] = output.getvalue() + str(result)
+        except MyException as e:
+            res["status"] = "error"
+            res["result"] = str(e)
+        except Exception as e:
+            # an unexpected error of one command must not stop the batch
+            res["status"] = "error"
+            res["result"] = f"{type(e).__name__}: {e}"
+    res["warnings"] = [str(w.message) for w in warning_list]
+    res["ms"] = round((time.perf_counter() - start) * 1000, 3)
+    res["exit"] = func == exit_handler
+    return res
+
+
+def main_batch(in_stream, out_stream):
+    """
+    Executes the commands from a stream (one command per line) without any interaction with the user.
+    For each command, one JSON line with its status, result, warnings and latency is written,
+    the last line holds the summary. Empty lines and lines starting with '#' are skipped,
+    the execution stops after an exit command.
+    :param in_stream: stream with the commands.
+    :param out_stream: stream for the results.
+    :return: number of commands which failed.
+    """
+    new_profile_handler()
+    executed = failed = 0
+    start = time.perf_counter()
+    for line_number, line in enumerate(in_stream, 1):
+        u_input = line.strip()
+        if not u_input or u_input.startswith(COMMENT_STRING):
+            continue
+        res = execute_command(u_input)
+        executed += 1
+        failed += res["status"] != "ok"
+        exit_command = res.pop("exit")
+        out_stream.write(json.dumps({"line": line_number, **res}, ensure_ascii=False) + "\n")
+        if exit_command:
+            break
+    duration = time.perf_counter() - start
+    summary = {
+        "commands": executed,
+        "failed": failed,
+        "ms": round(duration * 1000, 3),
+        "commands_per_second": round(executed / duration, 1) if duration else None,
+    }
+    out_stream.write(json.dumps({"summary": summary}) + "\n")
+    return failed
+
+
 def main(*args):
     print(
         "Hello and welcome to the ADDRESS BOOK! How can I help you?\n"
@@ -630,4 +813,12 @@ def main(*args):
 
 
 if __name__ == "__main__":
+    # python -m address_book.main --batch (<path>): executes the commands from the file or the standard input
+    if len(sys.argv) > 1 and sys.argv[1] == BATCH_STRING:
+        if len(sys.argv) > 2 and sys.argv[2] != "-":
+            with open(sys.argv[2], encoding="utf-8") as f:
+                failed = main_batch(f, sys.stdout)
+        else:
+            failed = main_batch(sys.stdin, sys.stdout)
+        sys.exit(1 if failed else 0)
     main()
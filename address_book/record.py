@@ -1,7 +1,6 @@
 from .fields import *
-from collections import deque
 from .myexception import *
-from datetime import datetime
+from datetime import datetime, date
 import warnings
 from prettytable import PrettyTable
 
@@ -11,12 +10,28 @@ class Record:
     Class representing a single record in an address book.
     """
 
+    __slots__ = (
+        "name",
+        "phones",
+        "emails",
+        "birthday",
+        "address",
+        "version",  # incremented by every change of the record
+        "render_cache",  # (version, date, rendered table) for to_string()
+        "birthday_info_cache",  # (version, date, birthday info) for display_birthday_info()
+    )
+    # attributes with the rendered output which are not stored
+    CACHE_SLOTS = ("render_cache", "birthday_info_cache")
+
     def __init__(self, name: str, phone=None, email=None, birthday=None, address=None):
         self.name = Name(name)
-        self.phones = deque()
-        self.emails = deque()
+        self.phones = []
+        self.emails = []
         self.birthday = None
         self.address = None
+        self.version = 0
+        self.render_cache = None
+        self.birthday_info_cache = None
         if phone:
             self.add_phone_number(phone)
         if email:
@@ -26,6 +41,64 @@ class Record:
         if address:
             self.edit_address(address)
 
+    def __getstate__(self):
+        return {
+            name: getattr(self, name)
+            for name in Record.__slots__
+            if name not in Record.CACHE_SLOTS
+        }
+
+    def __setstate__(self, state):
+        """
+        Restores the record from the pickled state. Records stored before the slots were introduced
+        (state as a dict, phones and e-mails as deques, no version) are migrated.
+        :param state: the pickled state.
+        """
+        state = get_state_dict(state)
+        self.name = state["name"]
+        self.phones = list(state.get("phones", ()))
+        self.emails = list(state.get("emails", ()))
+        self.birthday = state.get("birthday")
+        self.address = state.get("address")
+        self.version = state.get("version", 0)
+        self.render_cache = None
+        self.birthday_info_cache = None
+
+    def get_snapshot(self) -> tuple:
+        """
+        Returns the data needed to restore the current state of the record (e.g. to roll back changes).
+        Phone and e-mail objects are shared: the record replaces them instead of changing them.
+        :return: snapshot of the record.
+        """
+        return (
+            self.get_name(),
+            list(self.phones),
+            list(self.emails),
+            self.get_birthday(),
+            self.get_address(),
+        )
+
+    def restore_snapshot(self, snapshot: tuple):
+        """
+        Restores the state of the record saved by get_snapshot().
+        :param snapshot: snapshot of the record.
+        :return: None.
+        """
+        name, phones, emails, birthday, address = snapshot
+        self.name = Name(name)
+        self.phones = phones
+        self.emails = emails
+        self.birthday = Birthday.from_validated(birthday) if birthday else None
+        self.address = Address(address) if address else None
+        self.bump_version()
+
+    def bump_version(self):
+        """
+        Marks the record as changed: invalidates the rendered output.
+        Called after the change succeeded, so a rejected value does not invalidate it.
+        """
+        self.version += 1
+
     def get_field_value(self, el: Field):
         if el:
             return el.get_value()
@@ -35,7 +108,7 @@ class Record:
     def get_name(self):
         return self.get_field_value(self.name)  # self.name.get_value()
 
-    def get_all_values(self, el_list: deque):
+    def get_all_values(self, el_list: list):
         """
         Returns list of values stored in a collection of Field objects.
         :param el_list: collection of Field objects.
@@ -84,6 +157,7 @@ class Record:
 
     def edit_name(self, new_name):
         self.name.set_value(new_name)
+        self.bump_version()
 
     def edit_birthday(self, new_birthday):
         if not self.birthday:
@@ -93,6 +167,7 @@ class Record:
                 f"WARNING: you are overwriting existing birthday info. Old info: '{self.birthday.get_value()}', new info: '{new_birthday}'."
             )
             self.birthday.set_value(new_birthday)
+        self.bump_version()
 
     def edit_address(self, new_address: str):
         if not self.address:
@@ -102,20 +177,23 @@ class Record:
                 f"WARNING: you are overwriting existing address info. Old info: '{self.address.get_value()}', new info: '{new_address}'."
             )
             self.address.set_value(new_address)
+        self.bump_version()
 
     def remove_birthday(self):
         self.birthday = None
+        self.bump_version()
 
     def remove_address(self):
         self.address = None
+        self.bump_version()
 
-    def is_in_list(self, el: Field, el_list: deque):
+    def is_in_list(self, el: Field, el_list: list):
         el_value = el.get_value()
         list_values = self.get_all_values(el_list)
         return el_value in list_values
 
     def add_field_element(
-        self, el_list: deque, el: Field, idx=None, add_to_beginning=False
+        self, el_list: list, el: Field, idx=None, add_to_beginning=False
     ):
         """
         Adds element 'el' to the list 'el_list'.
@@ -130,7 +208,6 @@ class Record:
                                 If 'idx' is provided, add_to_beginning will be ignored
         :return: None
         """
-
         if self.is_in_list(el, el_list):
             raise MyException(
                 f"{el.get_name().title()} '{el.get_value()}' is already present."
@@ -155,9 +232,10 @@ class Record:
                     f"Provided index '{idx+1}' is out of range. Possible numbers: 1-{len(el_list)+1}."
                 )
         elif add_to_beginning:
-            el_list.appendleft(el)
+            el_list.insert(0, el)
         else:
             el_list.append(el)
+        self.bump_version()
 
     def add_phone_number(self, new_value: str, idx=None, add_to_beginning=False):
         phone = Phone(new_value)
@@ -172,7 +250,7 @@ class Record:
         )
 
     def remove_field_element(
-        self, el_list: deque, el=None, idx=None, first=False, last=False
+        self, el_list: list, el=None, idx=None, first=False, last=False
     ):
         """
         Removes an element from the list 'el_list'.
@@ -215,7 +293,7 @@ class Record:
                 raise MyException(f"Provided index '{idx+1}' is out of range.")
         elif first:
             try:
-                el_list.popleft()
+                el_list.pop(0)
             except IndexError:
                 raise MyException(
                     f"First {el.get_name()} can't be removed: the list is empty."
@@ -231,6 +309,7 @@ class Record:
             raise MyException(
                 f"Please specify the {el.get_name()} which has to be removed."
             )
+        self.bump_version()
 
     def remove_phone_number(self, cur_value="", idx=None, first=False, last=False):
         if cur_value:
@@ -252,7 +331,7 @@ class Record:
 
     def edit_field_element(
         self,
-        el_list: deque,
+        el_list: list,
         new_el: Field,
         old_el=None,
         idx=None,
@@ -321,6 +400,7 @@ class Record:
             raise MyException(
                 f"Please specify the {old_el.get_name()} which has to be edited."
             )
+        self.bump_version()
 
     def edit_phone_number(
         self, new_value: str, cur_value="", idx=None, first=False, last=False
@@ -388,12 +468,44 @@ class Record:
     def display_birthday_info(self):
         if self.birthday is None:
             return ""
-        else:
-            days_till_birthday = self.days_to_birthday()
-            days = "days" if days_till_birthday != 1 else "day"
-            return f"{self.birthday.get_value()} ({days_till_birthday} {days} till birthday)"
+        today = date.today()
+        cache = self.birthday_info_cache
+        if cache is not None and cache[0] == self.version and cache[1] == today:
+            return cache[2]
+        days_till_birthday = self.days_to_birthday()
+        days = "days" if days_till_birthday != 1 else "day"
+        res = f"{self.birthday.get_value()} ({days_till_birthday} {days} till birthday)"
+        self.birthday_info_cache = (self.version, today, res)
+        return res
 
     def to_string(self):
+        """
+        Renders the record as a table. The result is cached until the record
+        is changed or the day changes (the number of days till birthday is displayed).
+        :return: the record as a string.
+        """
+        today = date.today()
+        cache = self.render_cache
+        if cache is not None and cache[0] == self.version and cache[1] == today:
+            return cache[2]
+        res = self.render_table()
+        self.render_cache = (self.version, today, res)
+        return res
+
+    def to_plain_string(self):
+        """
+        Renders the record as plain lines "FIELD: value" (faster than the table, e.g. for bulk output).
+        :return: the record as a string.
+        """
+        return (
+            f"NAME: {self.get_name()}\n"
+            f"BIRTHDAY: {self.display_birthday_info()}\n"
+            f"PHONE(S): {', '.join(self.get_phones())}\n"
+            f"EMAIL(S): {', '.join(self.get_emails())}\n"
+            f"ADDRESS: {self.get_address()}"
+        )
+
+    def render_table(self):
         if len(self.phones) == 1:
             phones = [self.phones[0].get_value()]
         else:
@@ -0,0 +1,261 @@
+"""
+Columnar snapshot of an address book which is read through mmap.
+The values of each field class are stored as one column: the UTF-8 encoded values one after another
+plus an array with their offsets, so a single value is found without reading the rest of the file.
+The records are sorted by name (names are found by binary search), phones, e-mails, e-mail domains
+and birthdays have sorted key columns pointing to the positions of the records.
+Opening a snapshot only maps the file, the records are created when they are requested.
+"""
+import array
+import bisect
+import mmap
+import os
+import struct
+import sys
+from .record import *
+from .indexes import *
+from .journal import Journal
+
+# extension of the snapshot files
+SNAPSHOT_EXTENSION = ".snap"
+MAGIC = b"ABSNAP01"
+# separator of multiple phones/e-mails of one record within a column
+COLUMN_VALUES_SEPARATOR = "\x1f"
+# sections of the file, in the order they are stored
+SECTIONS = [
+    "username",
+    "name_offsets", "name_data",
+    "phone_offsets", "phone_data",
+    "email_offsets", "email_data",
+    "birthdays",  # packed birthdays (see Birthday.pack), 0 - no birthday
+    "address_offsets", "address_data",
+    "phone_key_offsets", "phone_key_data", "phone_positions",
+    "email_key_offsets", "email_key_data", "email_positions",
+    "domain_key_offsets", "domain_key_data", "domain_positions",
+    "birthday_keys", "birthday_positions",
+]
+# header: magic, byte order of the arrays ('l'/'b'), number of records, (offset, length) of each section
+HEADER = struct.Struct(f"<8sc x I {2 * len(SECTIONS)}Q")
+ALIGNMENT = 8
+OFFSET_TYPE = "Q"
+POSITION_TYPE = "I"
+BIRTHDAY_TYPE = "H"
+
+
+def make_string_column(values) -> tuple:
+    """
+    Encodes string values as a column.
+    :param values: iterable with strings.
+    :return: tuple (offsets array, data bytes).
+    """
+    offsets = array.array(OFFSET_TYPE, [0])
+    data = bytearray()
+    for value in values:
+        data += value.encode("utf-8")
+        offsets.append(len(data))
+    return offsets, bytes(data)
+
+
+def make_key_column(pairs: list) -> tuple:
+    """
+    Makes a sorted key column for lookups.
+    :param pairs: list of tuples (key, position of the record).
+    :return: tuple (offsets array, data bytes, positions array).
+    """
+    pairs.sort()
+    offsets, data = make_string_column(key for key, _ in pairs)
+    return offsets, data, array.array(POSITION_TYPE, [pos for _, pos in pairs])
+
+
+def write_snapshot(records, username: str, filename: str):
+    """
+    Writes the records into a snapshot file (atomically: a temporary file is written and renamed).
+    :param records: iterable with records.
+    :param username: owner of the address book.
+    :param filename: path of the file.
+    :return: None.
+    """
+    records = sorted(records, key=lambda record: record.get_name())
+    phones, emails, domains, birthdays = [], [], [], []
+    for pos, record in enumerate(records):
+        phones.extend((phone, pos) for phone in set(record.get_phones()))
+        normalized = {EmailIndex.normalize(email) for email in record.get_emails()}
+        emails.extend((email, pos) for email in normalized)
+        domains.extend(
+            (domain, pos)
+            for domain in {EmailDomainIndex.get_domain(email) for email in normalized}
+        )
+        if record.birthday:
+            birthdays.append((Birthday.pack(record.get_birthday()), pos))
+    birthdays.sort()
+    sections = [
+        username.encode("utf-8"),
+        *make_string_column(record.get_name() for record in records),
+        *make_string_column(
+            COLUMN_VALUES_SEPARATOR.join(record.get_phones()) for record in records
+        ),
+        *make_string_column(
+            COLUMN_VALUES_SEPARATOR.join(record.get_emails()) for record in records
+        ),
+        array.array(
+            BIRTHDAY_TYPE,
+            [
+                Birthday.pack(record.get_birthday()) if record.birthday else 0
+                for record in records
+            ],
+        ),
+        *make_string_column(record.get_address() for record in records),
+        *make_key_column(phones),
+        *make_key_column(emails),
+        *make_key_column(domains),
+        array.array(BIRTHDAY_TYPE, [key for key, _ in birthdays]),
+        array.array(POSITION_TYPE, [pos for _, pos in birthdays]),
+    ]
+    locations = []
+    body = bytearray()
+    for section in sections:
+        section = bytes(section)
+        body += b"\0" * (-(HEADER.size + len(body)) % ALIGNMENT)
+        locations += [HEADER.size + len(body), len(section)]
+        body += section
+    header = HEADER.pack(MAGIC, sys.byteorder[0].encode(), len(records), *locations)
+    Journal.write_file(filename, header + bytes(body))
+
+
+class StringColumn:
+    """
+    Sequence of strings stored in a column of a snapshot (supports bisect).
+    """
+
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, pos: int) -> str:
+        return str(self.data[self.offsets[pos] : self.offsets[pos + 1]], "utf-8")
+
+
+class Snapshot:
+    """
+    Read-only access to a snapshot file mapped into memory.
+    Several processes opening the same snapshot share its pages in the page cache.
+    """
+
+    def __init__(self, filename: str):
+        """
+        Maps the snapshot file. The records are not read.
+        :param filename: path of the file.
+        """
+        with open(filename, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise MyException(f"The file '{filename}' is not an address book snapshot.")
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, byteorder, self.size, *locations = HEADER.unpack_from(self.mm)
+        if magic != MAGIC:
+            self.mm.close()
+            raise MyException(f"The file '{filename}' is not an address book snapshot.")
+        if byteorder != sys.byteorder[0].encode():
+            self.mm.close()
+            raise MyException(
+                f"The snapshot '{filename}' was written on a machine with a different byte order."
+            )
+        self.views = [memoryview(self.mm)]  # all views of the map, they are released on closing
+        self.sections = {
+            section: self.views[0][offset : offset + length]
+            for section, offset, length in zip(SECTIONS, locations[::2], locations[1::2])
+        }
+        self.views.extend(self.sections.values())
+        self.username = str(self.sections["username"], "utf-8")
+        self.names = self.get_string_column("name")
+        self.phones = self.get_string_column("phone")
+        self.emails = self.get_string_column("email")
+        self.birthdays = self.get_array("birthdays", BIRTHDAY_TYPE)
+        self.addresses = self.get_string_column("address")
+        self.phone_keys = self.get_string_column("phone_key")
+        self.phone_positions = self.get_array("phone_positions", POSITION_TYPE)
+        self.email_keys = self.get_string_column("email_key")
+        self.email_positions = self.get_array("email_positions", POSITION_TYPE)
+        self.domain_keys = self.get_string_column("domain_key")
+        self.domain_positions = self.get_array("domain_positions", POSITION_TYPE)
+        self.birthday_keys = self.get_array("birthday_keys", BIRTHDAY_TYPE)
+        self.birthday_positions = self.get_array("birthday_positions", POSITION_TYPE)
+
+    def get_array(self, section: str, typecode: str) -> memoryview:
+        self.views.append(self.sections[section].cast(typecode))
+        return self.views[-1]
+
+    def get_string_column(self, column: str) -> StringColumn:
+        return StringColumn(
+            self.get_array(f"{column}_offsets", OFFSET_TYPE), self.sections[f"{column}_data"]
+        )
+
+    def close(self):
+        # the views have to be released before the map is closed
+        for view in reversed(self.views):
+            view.release()
+        self.views = []
+        self.sections = {}
+        self.mm.close()
+
+    def find_name(self, name: str):
+        """
+        Finds the position of the record with the name.
+        :param name: name of the record.
+        :return: position or None if there is no such record.
+        """
+        pos = bisect.bisect_left(self.names, name)
+        if pos < self.size and self.names[pos] == name:
+            return pos
+        return None
+
+    @staticmethod
+    def find_key(keys, positions: memoryview, key) -> list:
+        """
+        Finds the positions of the records stored under the key in a sorted key column.
+        :param keys: sorted keys.
+        :param positions: positions of the records for the keys.
+        :param key: key to look for.
+        :return: sorted list of positions.
+        """
+        start = bisect.bisect_left(keys, key)
+        end = bisect.bisect_right(keys, key, start)
+        return sorted(positions[start:end])
+
+    def find_phone(self, phone: str) -> list:
+        return self.find_key(self.phone_keys, self.phone_positions, phone)
+
+    def find_email(self, email: str) -> list:
+        return self.find_key(self.email_keys, self.email_positions, EmailIndex.normalize(email))
+
+    def find_domain(self, domain: str) -> list:
+        return self.find_key(
+            self.domain_keys, self.domain_positions, EmailDomainIndex.get_domain(domain)
+        )
+
+    def find_birthday(self, month: int, day: int) -> list:
+        return self.find_key(
+            self.birthday_keys, self.birthday_positions, Birthday.pack(f"{day}/{month}")
+        )
+
+    def get_values(self, column: StringColumn, pos: int) -> list:
+        value = column[pos]
+        return value.split(COLUMN_VALUES_SEPARATOR) if value else []
+
+    def get_record(self, pos: int) -> Record:
+        """
+        Creates the record stored at the position. The values were validated when the snapshot was written.
+        :param pos: position of the record.
+        :return: the record.
+        """
+        record = Record(self.names[pos])
+        record.phones = [Phone.from_validated(phone) for phone in self.get_values(self.phones, pos)]
+        record.emails = [Email.from_validated(email) for email in self.get_values(self.emails, pos)]
+        if self.birthdays[pos]:
+            record.birthday = Birthday.from_validated(Birthday.unpack(self.birthdays[pos]))
+        address = self.addresses[pos]
+        if address:
+            record.address = Address.from_validated(address)
+        return record
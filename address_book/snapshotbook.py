@@ -0,0 +1,246 @@
+"""
+Read-only address book opened from a columnar snapshot file (see snapshot.py).
+"""
+import calendar
+import os
+from datetime import datetime, timedelta
+from .addressbook import *
+from .snapshot import *
+
+
+class SnapshotAddressBook:
+    """
+    Class representing a read-only address book stored in a snapshot file.
+    Supports the same lookups as AddressBook, the records are sorted by name.
+    The returned records are copies: changing them does not change the snapshot.
+    """
+
+    # extension of the files the address book is stored in
+    FILE_EXTENSION = SNAPSHOT_EXTENSION
+
+    def __init__(self, filename=None):
+        """
+        Initiates the address book.
+        :param filename: snapshot file. If None, the address book is empty until a snapshot is loaded.
+        """
+        self.snapshot = None
+        self.username = "defaultuser"
+        self.n = None  # number of records to be returned per one iteration
+        if filename:
+            self.load_from_file(filename)
+
+    def get_username(self):
+        return self.username
+
+    def set_username(self, new_name):
+        self.username = new_name
+
+    def set_number_records_per_iteration(self, new_n: int):
+        AddressBook.set_number_records_per_iteration(self, new_n)
+
+    def __len__(self):
+        return self.snapshot.size if self.snapshot else 0
+
+    def __contains__(self, name):
+        return self.snapshot is not None and self.snapshot.find_name(name) is not None
+
+    def check_not_empty(self):
+        if not len(self):
+            raise MyException(f"The address book is empty.")
+
+    def check_writable(self, *args, **kwargs):
+        raise MyException(
+            "The address book is opened from a snapshot and cannot be changed. "
+            "Load the address book without '-snapshot' to change it."
+        )
+
+    # the snapshot is read-only: all the methods changing the records raise an exception
+    add_record = add_records = delete_record = check_writable
+    edit_record_name = edit_record = apply_changes = check_writable
+
+    def get_records(self, positions) -> list:
+        return [self.snapshot.get_record(pos) for pos in positions]
+
+    def select_records(self):
+        """
+        Yields all records, one by one.
+        :return: generator of records.
+        """
+        for pos in range(len(self)):
+            yield self.snapshot.get_record(pos)
+
+    def get_record_by_name(self, name: str):
+        self.check_not_empty()
+        pos = self.snapshot.find_name(name)
+        if pos is None:
+            raise MyException(f"No record with the name '{name}' in the address book.")
+        return self.snapshot.get_record(pos)
+
+    def get_record_by_phone(self, phone: str):
+        self.check_not_empty()
+        res = self.get_records(self.snapshot.find_phone(phone))
+        if not res:
+            raise MyException(
+                f"No record with the phone number '{phone}' in the address book."
+            )
+        return res
+
+    def get_record_by_email(self, email: str):
+        self.check_not_empty()
+        res = self.get_records(self.snapshot.find_email(email))
+        if not res:
+            raise MyException(
+                f"No record with the e-mail '{email}' in the address book."
+            )
+        return res
+
+    def get_record_by_email_domain(self, domain: str):
+        self.check_not_empty()
+        res = self.get_records(self.snapshot.find_domain(domain))
+        if not res:
+            raise MyException(
+                f"No record with an e-mail at the domain '{domain}' in the address book."
+            )
+        return res
+
+    def get_positions_by_date(self, date: datetime) -> list:
+        """
+        Finds the positions of all records with the birthday on the given date.
+        Birthdays on 29/02 are celebrated on 01/03 in non-leap years (as in Record.days_to_birthday).
+        :param date: date of the birthday.
+        :return: list of positions.
+        """
+        positions = self.snapshot.find_birthday(date.month, date.day)
+        if date.month == 3 and date.day == 1 and not calendar.isleap(date.year):
+            positions += self.snapshot.find_birthday(2, 29)
+        return positions
+
+    def get_record_by_birthday(self, birthday: str):
+        self.check_not_empty()
+        birthday = Birthday.reformat_value(birthday)
+        month, day = BirthdayIndex.get_month_day(birthday)
+        res = self.get_records(self.snapshot.find_birthday(month, day))
+        if not res:
+            raise MyException(
+                f"No record with the birthday date '{birthday}' in the address book."
+            )
+        return res
+
+    def get_record_by_days_till_birthday(self, n_days: str):
+        try:
+            n_days = int(n_days)
+        except ValueError:
+            raise MyException(
+                f"The given parameter '{n_days}' for the number of days is not a valid integer number."
+            )
+        self.check_not_empty()
+        birthday = datetime.now() + timedelta(days=n_days)
+        res = self.get_records(self.get_positions_by_date(birthday))
+        if not res:
+            raise MyException(
+                f"No record with the birthday date '{birthday.day:02}/{birthday.month:02}' in the address book."
+            )
+        return res
+
+    def get_record_by_upcoming_birthdays(self, n_days: str):
+        try:
+            n_days = int(n_days)
+            if n_days < 0:
+                raise ValueError()
+        except ValueError:
+            raise MyException(
+                f"The given parameter '{n_days}' for the number of days is not a valid non-negative integer number."
+            )
+        self.check_not_empty()
+        cur_day = datetime.now()
+        positions = {}  # used as an ordered set: a birthday can be met twice within 366 days
+        for days in range(min(n_days, 365) + 1):
+            date = cur_day + timedelta(days=days)
+            positions.update(dict.fromkeys(self.get_positions_by_date(date)))
+        res = self.get_records(positions)
+        if not res:
+            raise MyException(
+                f"No record with the birthday within the next {n_days} days in the address book."
+            )
+        return res
+
+    def get_record_by_string(self, substring: str, fields="np"):
+        self.check_not_empty()
+        snapshot = self.snapshot
+        # the columns are searched as they are stored, records are created only for the matches
+        columns = {
+            "n": snapshot.names,
+            "p": snapshot.phones,
+            "e": snapshot.emails,
+            "a": snapshot.addresses,
+        }
+        columns = [column for field, column in columns.items() if field in fields]
+        res = []
+        for pos in range(len(self)):
+            if any(substring in column[pos] for column in columns) or (
+                "b" in fields
+                and snapshot.birthdays[pos]
+                and substring in Birthday.unpack(snapshot.birthdays[pos])
+            ):
+                res.append(snapshot.get_record(pos))
+        if not res:
+            raise MyException(
+                f"No record with the substring '{substring}' within the fields '{fields}' in the address book."
+            )
+        return res
+
+    def get_record_by_address(self, address: str):
+        self.check_not_empty()
+        addresses = self.snapshot.addresses
+        res = self.get_records(pos for pos in range(len(self)) if addresses[pos] == address)
+        if not res:
+            raise MyException(
+                f"No record with the address '{address}' in the address book."
+            )
+        return res
+
+    def store_to_file(self, path="", filename="", snapshot=False):
+        """
+        The snapshot is read-only: nothing can be stored.
+        """
+        raise MyException(
+            "The address book is opened read-only from a snapshot: nothing was stored. "
+            "Load the address book without '-snapshot' to change and store it."
+        )
+
+    def load_from_file(self, filename):
+        """
+        Opens the snapshot file. Only the file header is read, the records are read when they are requested.
+        :param filename: path of the file.
+        :return: None.
+        """
+        if not os.path.exists(filename):
+            raise MyException(
+                f"Address book cannot be loaded from the file '{filename}: the file does not exist."
+            )
+        snapshot = Snapshot(filename)
+        if self.snapshot is not None:
+            self.snapshot.close()
+        self.snapshot = snapshot
+        self.username = snapshot.username
+
+    def export(self, filename: str, file_format=None, fields="npeba", records=None) -> int:
+        """
+        Exports the records into a CSV or JSON Lines file. The records are read from the snapshot one by one.
+        :param filename: path of the file or '-' for the standard output.
+        :param file_format: 'csv' or 'jsonl'. If None, the extension of the file is used.
+        :param fields: field classes to export: any combination of 'n', 'p', 'e', 'b', 'a'.
+        :param records: records to export (e.g. found by get_record_by_*). By default, all records are exported.
+        :return: number of exported records.
+        """
+        if records is None:
+            records = self.select_records()
+        elif type(records) == Record:
+            records = [records]
+        return export_records(records, filename, file_format, fields)
+
+    def iterator(self, n=None, plain=False):
+        return ABIterator(self.select_records(), n, plain)
+
+    def to_string(self, plain=False):
+        return AddressBook.display_records(self.select_records(), plain=plain)
@@ -0,0 +1,555 @@
+"""
+Address book stored in an SQLite database. Records are created only when they are returned.
+"""
+import calendar
+import os
+import sqlite3
+import warnings
+from datetime import datetime, timedelta
+from .addressbook import *
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    birthday_key INTEGER,
+    address TEXT
+);
+CREATE TABLE IF NOT EXISTS phones (record_id INTEGER NOT NULL, pos INTEGER NOT NULL, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS emails (
+    record_id INTEGER NOT NULL,
+    pos INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    normalized TEXT NOT NULL,
+    domain TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_birthday ON records (birthday_key);
+CREATE INDEX IF NOT EXISTS records_address ON records (address);
+CREATE INDEX IF NOT EXISTS phones_record ON phones (record_id);
+CREATE INDEX IF NOT EXISTS phones_value ON phones (value);
+CREATE INDEX IF NOT EXISTS emails_record ON emails (record_id);
+CREATE INDEX IF NOT EXISTS emails_normalized ON emails (normalized);
+CREATE INDEX IF NOT EXISTS emails_domain ON emails (domain);
+"""
+
+# number of records read at once: their phones and e-mails are read with one query per table
+# (below the SQLite limit of 999 parameters of old versions)
+SELECT_BATCH_SIZE = 500
+
+# field class (as in AddressBook.get_record_by_string) -> SQL condition with one parameter
+SUBSTRING_CONDITIONS = {
+    "n": "instr(r.name, ?) > 0",
+    "p": "r.id IN (SELECT record_id FROM phones WHERE instr(value, ?) > 0)",
+    "e": "r.id IN (SELECT record_id FROM emails WHERE instr(value, ?) > 0)",
+    "b": "r.birthday_key IS NOT NULL AND instr(printf('%02d/%02d', r.birthday_key % 100, r.birthday_key / 100), ?) > 0",
+    "a": "instr(r.address, ?) > 0",
+}
+
+
+class SQLiteAddressBook:
+    """
+    Class representing the address book stored in an SQLite database.
+    Supports the same public methods as AddressBook.
+    """
+
+    # extension of the files the address book is stored in
+    FILE_EXTENSION = ".db"
+
+    @staticmethod
+    def get_birthday_key(month: int, day: int) -> int:
+        return month * 100 + day
+
+    def __init__(self, username="defaultuser", filename=":memory:"):
+        """
+        Initiates the address book.
+        :param username: name of the owner of the address book.
+        :param filename: database file. By default, the database is kept in memory until it is stored.
+        """
+        self.conn = None
+        self.filename = None
+        self.connect(filename)
+        self.n = None  # number of records to be returned per one iteration
+        if self.get_username() is None:
+            self.set_username(username)
+
+    def connect(self, filename):
+        if self.conn is not None:
+            self.conn.close()
+        self.conn = sqlite3.connect(filename)
+        self.conn.executescript(SCHEMA)
+        self.filename = filename
+
+    def get_username(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'username'").fetchone()
+        return row[0] if row else None
+
+    def set_username(self, new_name):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('username', ?)", (new_name,)
+        )
+
+    def set_number_records_per_iteration(self, new_n: int):
+        AddressBook.set_number_records_per_iteration(self, new_n)
+
+    def __len__(self):
+        return self.conn.execute("SELECT count(*) FROM records").fetchone()[0]
+
+    def __contains__(self, name):
+        return self.get_record_id(name) is not None
+
+    def get_record_id(self, name: str):
+        row = self.conn.execute("SELECT id FROM records WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def write_record(self, record: Record, record_id=None):
+        """
+        Writes the record into the database.
+        :param record: record to be written.
+        :param record_id: id of the row to be overwritten. If None, a new row is inserted.
+        :return: None.
+        """
+        birthday_key = None
+        if record.birthday:
+            month, day = BirthdayIndex.get_month_day(record.get_birthday())
+            birthday_key = self.get_birthday_key(month, day)
+        address = record.get_address() or None
+        if record_id is None:
+            cursor = self.conn.execute(
+                "INSERT INTO records (name, birthday_key, address) VALUES (?, ?, ?)",
+                (record.get_name(), birthday_key, address),
+            )
+            record_id = cursor.lastrowid
+        else:
+            self.conn.execute(
+                "UPDATE records SET name = ?, birthday_key = ?, address = ? WHERE id = ?",
+                (record.get_name(), birthday_key, address, record_id),
+            )
+            self.conn.execute("DELETE FROM phones WHERE record_id = ?", (record_id,))
+            self.conn.execute("DELETE FROM emails WHERE record_id = ?", (record_id,))
+        self.conn.executemany(
+            "INSERT INTO phones (record_id, pos, value) VALUES (?, ?, ?)",
+            [(record_id, pos, phone) for pos, phone in enumerate(record.get_phones())],
+        )
+        self.conn.executemany(
+            "INSERT INTO emails (record_id, pos, value, normalized, domain) VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    record_id,
+                    pos,
+                    email,
+                    EmailIndex.normalize(email),
+                    EmailDomainIndex.get_domain(email),
+                )
+                for pos, email in enumerate(record.get_emails())
+            ],
+        )
+
+    def delete_rows(self, record_id: int):
+        self.conn.execute("DELETE FROM records WHERE id = ?", (record_id,))
+        self.conn.execute("DELETE FROM phones WHERE record_id = ?", (record_id,))
+        self.conn.execute("DELETE FROM emails WHERE record_id = ?", (record_id,))
+
+    def make_record(self, row, phones=(), emails=()) -> Record:
+        """
+        Creates a Record object from a row of the table 'records'.
+        :param row: tuple (id, name, birthday_key, address).
+        :param phones: phones of the record in their order.
+        :param emails: e-mails of the record in their order.
+        :return: the record.
+        """
+        record_id, name, birthday_key, address = row
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # values were validated when they were added
+            record = Record(name)
+            record.phones.extend(Phone(phone) for phone in phones)
+            record.emails.extend(Email(email) for email in emails)
+            if birthday_key is not None:
+                record.birthday = Birthday(f"{birthday_key % 100}/{birthday_key // 100}")
+            if address is not None:
+                record.address = Address(address)
+        return record
+
+    def select_values(self, table: str, record_ids: list) -> dict:
+        """
+        Reads the phones or the e-mails of several records with one query.
+        :param table: 'phones' or 'emails'.
+        :param record_ids: ids of the records.
+        :return: dictionary {record id: list of values in their order}.
+        """
+        placeholders = ", ".join("?" * len(record_ids))
+        res = {}
+        for record_id, value in self.conn.execute(
+            f"SELECT record_id, value FROM {table} WHERE record_id IN ({placeholders}) ORDER BY record_id, pos",
+            record_ids,
+        ):
+            res.setdefault(record_id, []).append(value)
+        return res
+
+    def select_records(self, condition="1", params=()):
+        """
+        Yields the records which satisfy the SQL condition, in the order they were added.
+        The records are read in batches: the phones and the e-mails of a batch are read with one query each.
+        :param condition: SQL condition on the table 'records' (alias 'r').
+        :param params: parameters of the condition.
+        :return: generator of records.
+        """
+        rows = self.conn.execute(
+            f"SELECT r.id, r.name, r.birthday_key, r.address FROM records r WHERE {condition} ORDER BY r.id",
+            params,
+        )
+        while True:
+            batch = rows.fetchmany(SELECT_BATCH_SIZE)
+            if not batch:
+                break
+            record_ids = [row[0] for row in batch]
+            phones = self.select_values("phones", record_ids)
+            emails = self.select_values("emails", record_ids)
+            for row in batch:
+                yield self.make_record(row, phones.get(row[0], ()), emails.get(row[0], ()))
+
+    def check_not_empty(self):
+        if not self.conn.execute("SELECT 1 FROM records LIMIT 1").fetchone():
+            raise MyException(f"The address book is empty.")
+
+    def add_record(self, record: Record):
+        """
+        Adds a new record to the address book.
+        :param record: new record to be added to the address book.
+        :return: None.
+        """
+        record_id = self.get_record_id(record.get_name())
+        if record_id is not None:
+            warnings.warn(
+                f"WARNING: the record for the contact '{record.get_name()}' gets overwritten."
+            )
+        self.write_record(record, record_id)
+
+    def add_records(self, records) -> int:
+        """
+        Adds multiple records to the address book (e.g. on import).
+        Records with the names already present overwrite the old ones without separate warnings.
+        :param records: iterable with new records.
+        :return: number of overwritten records.
+        """
+        overwritten = 0
+        for record in records:
+            record_id = self.get_record_id(record.get_name())
+            if record_id is not None:
+                overwritten += 1
+            self.write_record(record, record_id)
+        return overwritten
+
+    def delete_record(self, name: str):
+        """
+        Deletes a record from the address book.
+        :param name: contact name stored in the record which has to be deleted.
+        :return: None.
+        """
+        record_id = self.get_record_id(name)
+        if record_id is None:
+            raise MyException(
+                f"The record for the contact '{name}' cannot be deleted: this name is not in the "
+                f"address book."
+            )
+        self.delete_rows(record_id)
+
+    def edit_record_name(self, old_name: str, new_name: str):
+        """
+        Changes the contact name within a record.
+        :param old_name: old name stored in a record that has to be changed.
+        :param new_name: new name to replace the old one.
+        :return: the changed record.
+        """
+        record_id = self.get_record_id(old_name)
+        if record_id is None:
+            raise MyException(
+                f"Cannot change the name of a record: the name '{old_name}' is not in the address book."
+            )
+        overwritten_id = self.get_record_id(new_name)
+        if overwritten_id is not None and overwritten_id != record_id:
+            warnings.warn(
+                f"WARNING: the record for the contact '{new_name}' gets overwritten."
+            )
+            self.delete_rows(overwritten_id)
+        self.conn.execute(
+            "UPDATE records SET name = ? WHERE id = ?", (new_name, record_id)
+        )
+        return self.get_record_by_name(new_name)
+
+    def edit_record(self, change: Change):
+        """
+        Conducts changes specified by the Change object.
+        :param change: object containing information about the change which has to be performed.
+        :return: the changed record.
+        """
+        name = change.get_name()
+        changetype = change.get_changetype()
+        kwargs = change.get_kwargs()
+        record = self.get_record_by_name(name)
+        if changetype == ChangeType.EDIT_NAME:
+            return self.edit_record_name(old_name=name, new_name=kwargs["new_name"])
+        AddressBook.apply_change(record, changetype, kwargs)
+        self.write_record(record, self.get_record_id(name))
+        return record
+
+    def apply_changes(self, changes) -> list:
+        """
+        Applies multiple changes as one transaction (an SQL savepoint):
+        if one of the changes fails, all the changes are rolled back.
+        :param changes: iterable with Change objects.
+        :return: list of the changed records.
+        """
+        changed = {}
+        self.conn.execute("SAVEPOINT batch")
+        try:
+            for position, change in enumerate(changes):
+                try:
+                    record = self.edit_record(change)
+                except MyException as e:
+                    raise MyException(
+                        f"The changes were not applied: change {position + 1} failed. {e}"
+                    )
+                changed.pop(change.get_name(), None)
+                changed[record.get_name()] = record
+        except Exception:
+            self.conn.execute("ROLLBACK TO batch")
+            raise
+        finally:
+            self.conn.execute("RELEASE batch")
+        return list(changed.values())
+
+    def get_record_by_name(self, name: str):
+        """
+        Finds a record by the contact name in it.
+        :param name: the name to look for in records.
+        :return: a record with the specified name.
+        """
+        self.check_not_empty()
+        res = list(self.select_records("r.name = ?", (name,)))
+        if not res:
+            raise MyException(f"No record with the name '{name}' in the address book.")
+        return res[0]
+
+    def get_record_by_phone(self, phone: str):
+        self.check_not_empty()
+        res = list(
+            self.select_records(
+                "r.id IN (SELECT record_id FROM phones WHERE value = ?)", (phone,)
+            )
+        )
+        if not res:
+            raise MyException(
+                f"No record with the phone number '{phone}' in the address book."
+            )
+        return res
+
+    def get_record_by_email(self, email: str):
+        self.check_not_empty()
+        res = list(
+            self.select_records(
+                "r.id IN (SELECT record_id FROM emails WHERE normalized = ?)",
+                (EmailIndex.normalize(email),),
+            )
+        )
+        if not res:
+            raise MyException(
+                f"No record with the e-mail '{email}' in the address book."
+            )
+        return res
+
+    def get_record_by_email_domain(self, domain: str):
+        self.check_not_empty()
+        res = list(
+            self.select_records(
+                "r.id IN (SELECT record_id FROM emails WHERE domain = ?)",
+                (EmailDomainIndex.get_domain(domain),),
+            )
+        )
+        if not res:
+            raise MyException(
+                f"No record with an e-mail at the domain '{domain}' in the address book."
+            )
+        return res
+
+    def get_birthday_keys_by_date(self, date: datetime) -> list:
+        """
+        Returns the birthday keys celebrated on the given date.
+        Birthdays on 29/02 are celebrated on 01/03 in non-leap years (as in Record.days_to_birthday).
+        :param date: date of the birthday.
+        :return: list of birthday keys.
+        """
+        keys = [self.get_birthday_key(date.month, date.day)]
+        if date.month == 3 and date.day == 1 and not calendar.isleap(date.year):
+            keys.append(self.get_birthday_key(2, 29))
+        return keys
+
+    def select_by_birthday_keys(self, keys: list) -> list:
+        """
+        Finds the records with the given birthday keys, sorted in the order of the keys.
+        :param keys: list of birthday keys.
+        :return: list of records.
+        """
+        order = {}
+        for key in keys:
+            order.setdefault(key, len(order))
+        placeholders = ", ".join("?" * len(order))
+        res = self.select_records(f"r.birthday_key IN ({placeholders})", list(order))
+        return sorted(
+            res,
+            key=lambda record: order[
+                self.get_birthday_key(*BirthdayIndex.get_month_day(record.get_birthday()))
+            ],
+        )
+
+    def get_record_by_birthday(self, birthday: str):
+        self.check_not_empty()
+        birthday = Birthday.reformat_value(birthday)
+        month, day = BirthdayIndex.get_month_day(birthday)
+        res = self.select_by_birthday_keys([self.get_birthday_key(month, day)])
+        if not res:
+            raise MyException(
+                f"No record with the birthday date '{birthday}' in the address book."
+            )
+        return res
+
+    def get_record_by_days_till_birthday(self, n_days: str):
+        try:
+            n_days = int(n_days)
+        except ValueError:
+            raise MyException(
+                f"The given parameter '{n_days}' for the number of days is not a valid integer number."
+            )
+        self.check_not_empty()
+        birthday = datetime.now() + timedelta(days=n_days)
+        res = self.select_by_birthday_keys(self.get_birthday_keys_by_date(birthday))
+        if not res:
+            raise MyException(
+                f"No record with the birthday date '{birthday.day:02}/{birthday.month:02}' in the address book."
+            )
+        return res
+
+    def get_record_by_upcoming_birthdays(self, n_days: str):
+        try:
+            n_days = int(n_days)
+            if n_days < 0:
+                raise ValueError()
+        except ValueError:
+            raise MyException(
+                f"The given parameter '{n_days}' for the number of days is not a valid non-negative integer number."
+            )
+        self.check_not_empty()
+        cur_day = datetime.now()
+        keys = []
+        for days in range(min(n_days, 365) + 1):
+            keys.extend(self.get_birthday_keys_by_date(cur_day + timedelta(days=days)))
+        res = self.select_by_birthday_keys(keys)
+        if not res:
+            raise MyException(
+                f"No record with the birthday within the next {n_days} days in the address book."
+            )
+        return res
+
+    def get_record_by_string(self, substring: str, fields="np"):
+        self.check_not_empty()
+        conditions = [
+            condition
+            for field, condition in SUBSTRING_CONDITIONS.items()
+            if field in fields
+        ]
+        res = []
+        if conditions:
+            res = list(
+                self.select_records(
+                    " OR ".join(conditions), [substring] * len(conditions)
+                )
+            )
+        if not res:
+            raise MyException(
+                f"No record with the substring '{substring}' within the fields '{fields}' in the address book."
+            )
+        return res
+
+    def get_record_by_address(self, address: str):
+        self.check_not_empty()
+        res = list(self.select_records("r.address = ?", (address,)))
+        if not res:
+            raise MyException(
+                f"No record with the address '{address}' in the address book."
+            )
+        return res
+
+    def store_to_file(self, path="", filename="", snapshot=False):
+        """
+        Stores the address book into the database file "<filename>.db"
+        (by default, the username is used as the filename).
+        If the address book is already kept in this file, only the pending changes are committed.
+        :param path: folder for the file.
+        :param filename: name of the file without the extension.
+        :param snapshot: if True, a read-only snapshot "<filename>.snap" is written as well (see SnapshotAddressBook),
+                        an existing snapshot is always rewritten.
+        :return: None.
+        """
+        if not filename:
+            filename = self.get_username()
+        snapshot_filename = os.path.join(path, filename + SNAPSHOT_EXTENSION)
+        # an existing snapshot is rewritten, so that it does not show outdated records
+        if snapshot or os.path.exists(snapshot_filename):
+            write_snapshot(self.select_records(), self.get_username(), snapshot_filename)
+        filename = os.path.join(path, filename + self.FILE_EXTENSION)
+        self.conn.commit()
+        same_file = (
+            self.filename != ":memory:"
+            and os.path.exists(filename)
+            and os.path.samefile(self.filename, filename)
+        )
+        if not same_file:
+            target = sqlite3.connect(filename)
+            self.conn.backup(target)
+            target.close()
+            self.connect(filename)
+
+    def load_from_file(self, filename):
+        """
+        Opens the address book stored in a file. Address books stored by AddressBook ('.bin') get imported.
+        :param filename: path of the file.
+        :return: None.
+        """
+        if not os.path.exists(filename):
+            raise MyException(
+                f"Address book cannot be loaded from the file '{filename}: the file does not exist."
+            )
+        if not filename.endswith(AddressBook.FILE_EXTENSION):
+            # the database is opened as it is, records are read only when they are requested;
+            # changes which were not stored are discarded as by AddressBook
+            self.conn.rollback()
+            self.connect(filename)
+            return
+        ab = AddressBook()
+        ab.load_from_file(filename)
+        self.conn.rollback()
+        self.connect(":memory:")
+        self.set_username(ab.get_username())
+        for record in ab.data.values():
+            self.write_record(record)
+
+    def export(self, filename: str, file_format=None, fields="npeba", records=None) -> int:
+        """
+        Exports the records into a CSV or JSON Lines file. The records are read from the database lazily.
+        :param filename: path of the file or '-' for the standard output.
+        :param file_format: 'csv' or 'jsonl'. If None, the extension of the file is used.
+        :param fields: field classes to export: any combination of 'n', 'p', 'e', 'b', 'a'.
+        :param records: records to export (e.g. found by get_record_by_*). By default, all records are exported.
+        :return: number of exported records.
+        """
+        if records is None:
+            records = self.select_records()
+        elif type(records) == Record:
+            records = [records]
+        return export_records(records, filename, file_format, fields)
+
+    def iterator(self, n=None, plain=False):
+        return ABIterator(self.select_records(), n, plain)
+
+    def to_string(self, plain=False):
+        return AddressBook.display_records(self.select_records(), plain=plain)
@@ -0,0 +1,66 @@
+"""
+Prefix-trie command dispatch shared by the main menu, the Address Book and the Note Book.
+"""
+
+
+class CommandTrie:
+    """
+    Class representing a prefix tree of commands (case insensitive).
+    A command can consist of several words (e.g. 'show all'). The input is matched against the longest
+    command which is followed by the end of the input or a whitespace, so the dispatch takes O(len(input)).
+    """
+
+    def __init__(self, commands=None):
+        """
+        Initiates the trie.
+        :param commands: optional dictionary {handler: command or list of commands (aliases)}.
+        """
+        self.root = {}
+        if commands:
+            for handler, aliases in commands.items():
+                self.add(aliases, handler)
+
+    def add(self, aliases, handler):
+        """
+        Adds the command(s) to the trie.
+        :param aliases: command or list of commands which are handled by the handler.
+        :param handler: object returned for the commands.
+        :return: None.
+        """
+        if isinstance(aliases, str):
+            aliases = [aliases]
+        for command in aliases:
+            node = self.root
+            for char in command.lower():
+                node = node.setdefault(char, {})
+            node[None] = handler  # the key None marks the end of a command
+
+    def match(self, raw_str: str):
+        """
+        Finds the longest command at the beginning of the input.
+        :param raw_str: user input.
+        :return: tuple (handler, length of the command in the input) or (None, 0) if no command matches.
+        """
+        node = self.root
+        res = None, 0
+        for pos, char in enumerate(raw_str.lower()):
+            if char.isspace() and None in node:
+                res = node[None], pos
+            node = node.get(char)
+            if node is None:
+                return res
+        if None in node:
+            res = node[None], len(raw_str)
+        return res
+
+    def parse(self, raw_str: str):
+        """
+        Splits the input into the handler of the command and the arguments.
+        :param raw_str: user input.
+        :return: tuple (handler, list of arguments) or (None, None) if no command matches.
+        """
+        raw_str = raw_str.strip()
+        handler, length = self.match(raw_str)
+        if handler is None:
+            return None, None
+        return handler, raw_str[length:].split()
@@ -1,6 +1,10 @@
 from pathlib import Path
+import time
 from . import sort
 
+# file the plan of the sorting is saved into for a review (dry run)
+PLAN_FILENAME = "./file_sorter/sort_plan.json"
+
 
 def main():
     print("You've entered File Sorter. To come back to the main menu type: *exit.")
@@ -38,9 +42,28 @@ def main():
         else:
             break
 
-    sort.read_folder(Path(folder_to_scan), Path(destination_folder))
+    walker = sort.FolderWalker(Path(folder_to_scan))
+    plan = sort.make_plan(Path(folder_to_scan), Path(destination_folder), walker, sort.DEDUP)
+    print(f"Files to sort:\n{sort.summarize_plan(plan)}")
+    answer = input(
+        f"Sort the files now? (y - yes, n - no, s - save the plan into '{PLAN_FILENAME}' without sorting): "
+    )
+    if answer == "s":
+        sort.dump_plan(plan, PLAN_FILENAME)
+        print("The plan has been saved. You are getting forwarded to the main menu...")
+        return
+    if answer != "y":
+        print("Nothing has been sorted. You are getting forwarded to the main menu...")
+        return
+
+    start = time.perf_counter()
+    count = sort.execute_plan(plan, sort.WORKERS, sort.ARCHIVE_WORKERS)
+    duration = time.perf_counter() - start
 
-    sort.handle_empty_folders(Path(folder_to_scan))
+    walker.remove_empty_folders(sort.get_moved_files(plan))
+    print(
+        f"{count} file(s) sorted in {duration:.2f} s ({count / duration if duration else 0:.0f} files/s)."
+    )
     print(
         f'The folder "{Path(folder_to_scan)}" has been sorted. You are getting forwarded to the main menu...'
     )
@@ -1,8 +1,35 @@
 import sys
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import hashlib
+import io
+import json
+import multiprocessing
 import shutil
 import re
 import os
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+
+# number of threads classifying and moving the files, 1 - one file after another
+WORKERS = 8
+# number of processes unpacking the archives, 0 - archives are unpacked by the sorting thread
+ARCHIVE_WORKERS = os.cpu_count() or 1
+# maximum number of archives waiting for unpacking: the sorting threads wait when it is reached
+ARCHIVE_QUEUE_SIZE = 16
+# archives with a larger unpacked size or taking longer to unpack are moved to 'Archives' without unpacking
+ARCHIVE_MAX_SIZE = 4 * 1024 ** 3  # bytes
+ARCHIVE_TIME_LIMIT = 600  # seconds
+# duplicates (files with the same content): None - not searched, 'report' - only marked in the plan,
+# 'skip' - left in the source folder, 'hardlink' - replaced by hard links to the first copy
+DEDUP = None
+DEDUP_MODES = ('report', 'skip', 'hardlink')
+# size of the beginning and of the end of a file hashed before the whole file is hashed
+PARTIAL_HASH_SIZE = 64 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
 
 DIRECTORY_NAME = {
     'JPEG': "Images",
@@ -29,34 +56,380 @@ DIRECTORY_NAME = {
     'TAR': "Archives"
 }
 
-def read_folder(path: Path, destination_folder: Path) -> None:
-    
-    for el in path.iterdir():
-        if Path(el).is_dir():
-            if el.name not in ('Archives', 'Video', 'Audio', 'Documents', 'Images', 'Others'):
-                read_folder(Path(el), destination_folder)
+# folders the files are sorted into: they are neither scanned nor removed
+CATEGORY_FOLDERS = ('Archives', 'Video', 'Audio', 'Documents', 'Images', 'Others')
+
+# locks of the target folders: archives are unpacked or merged into a folder by one thread at a time
+FOLDER_LOCKS = {}
+FOLDER_LOCKS_LOCK = threading.Lock()
+
+
+class ArchiveLimitError(Exception):
+    pass
+
+
+class TimeLimitedReader(io.BufferedReader):
+    # the archive is read through it, so the time limit stops the unpacking in the middle of a large member too
+
+    def __init__(self, file: str, deadline: float, time_limit: float):
+
+        super().__init__(io.FileIO(file))
+        self.deadline = deadline
+        self.time_limit = time_limit
+
+    def read(self, size=-1) -> bytes:
+
+        if time.monotonic() > self.deadline:
+            raise ArchiveLimitError(f'unpacking takes longer than {self.time_limit} s')
+        return super().read(size)
+
+
+def extract_archive(file: str, folder: str, max_size: int, time_limit: float) -> None:
+    # runs in a worker process: the size is checked before the unpacking, the time while the archive is read
+    with TimeLimitedReader(file, time.monotonic() + time_limit, time_limit) as reader:
+        if zipfile.is_zipfile(file):
+            archive = zipfile.ZipFile(reader)
+            members = archive.infolist()
+            size = sum(member.file_size for member in members)
+        elif tarfile.is_tarfile(file):
+            archive = tarfile.open(fileobj=reader)
+            members = archive.getmembers()
+            size = sum(member.size for member in members)
         else:
-            fullname = path / el.name
-            handle_file(fullname, path, destination_folder)
+            raise shutil.ReadError(f'{file} is not an archive')
+        with archive:
+            if size > max_size:
+                raise ArchiveLimitError(f'unpacked size {size} bytes exceeds the limit {max_size} bytes')
+            for member in members:
+                archive.extract(member, folder)
 
-def handle_file(file: Path, path: Path, destination_folder: Path) -> None:
-    
-    file_name = file.name.rsplit('.',1)[0]
-    # ext = file.suffix[1:]
-    ext = file.name.rsplit('.',1)[1]
-         
-    if not ext:  
-        target_folder = destination_folder / 'Others'
-        transfer_file(file, target_folder)
-    else:
-        name = file_name + '.' + ext
-        file = path / name
+
+class ArchiveExtractor:
+    """
+    Unpacks the archives in a pool of processes while the other files are being sorted.
+    The archives are unpacked into temporary folders which are merged into the target folders by finish().
+    """
+
+    def __init__(self, workers: int, queue_size=ARCHIVE_QUEUE_SIZE, max_size=ARCHIVE_MAX_SIZE,
+                 time_limit=ARCHIVE_TIME_LIMIT):
+        # the processes are spawned, not forked: the sorting threads are running
+        self.executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.max_size = max_size
+        self.time_limit = time_limit
+        self.jobs = []  # (future, archive, target folder, temporary folder)
+        self.jobs_lock = threading.Lock()
+
+    def submit(self, file: Path, target_folder: Path) -> None:
+        self.slots.acquire()
+        tmp_folder = None
+        try:
+            tmp_folder = Path(tempfile.mkdtemp(prefix='.unpacking_', dir=target_folder))
+            future = self.executor.submit(
+                extract_archive, str(file), str(tmp_folder), self.max_size, self.time_limit
+            )
+        except Exception:  # e.g. the pool is broken or shut down: the archive stays where it is
+            self.slots.release()
+            if tmp_folder is not None:
+                shutil.rmtree(tmp_folder)
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        with self.jobs_lock:
+            self.jobs.append((future, file, target_folder, tmp_folder))
+
+    def finish(self) -> None:
+        self.executor.shutdown()
+        for future, file, target_folder, tmp_folder in self.jobs:
+            try:
+                future.result()
+            except shutil.ReadError:
+                print('It is not archive')
+                shutil.rmtree(tmp_folder)
+                file.unlink()
+                continue
+            except Exception as error:  # limits exceeded, broken archive or worker
+                print(f'The archive "{file.name}" is not unpacked: {error}')
+                shutil.rmtree(tmp_folder)
+                with get_folder_lock(target_folder):
+                    file.replace(get_free_name(target_folder, normalize(file.name)))
+                continue
+            merge_archive_folder(file, tmp_folder, target_folder)
+        self.jobs = []
+
+
+def merge_archive_folder(file: Path, tmp_folder: Path, target_folder: Path) -> None:
+
+    rename_files_and_folders(tmp_folder)
+    folder_for_file = target_folder / normalize(file.name.replace(file.suffix,''))
+    with get_folder_lock(folder_for_file):
+        if not folder_for_file.exists():
+            tmp_folder.replace(folder_for_file)
+        else:
+            for el in tmp_folder.iterdir():
+                el.replace(get_free_name(folder_for_file, el.name))
+            tmp_folder.rmdir()
+    file.unlink()
+
+
+def read_folder(path: Path, destination_folder: Path, workers=1, archive_workers=0, dedup=None) -> int:
+
+    walker = FolderWalker(path)
+    plan = make_plan(path, destination_folder, walker, dedup)
+    count = execute_plan(plan, workers, archive_workers)
+    walker.remove_empty_folders(get_moved_files(plan))
+    return count
+
+def get_category(file: Path) -> str:
+
+    ext = file.name.rsplit('.', 1)[1] if '.' in file.name else ''
+    return DIRECTORY_NAME.get(ext.upper(), 'Others')
+
+def make_plan(path: Path, destination_folder: Path, walker=None, dedup=None) -> list:
+    # phase one: nothing is changed, the destinations of all files are chosen
+    if walker is None:
+        walker = FolderWalker(path)
+    plan = []
+    taken_names = {}  # target folder -> names existing or planned in it
+    for entry in walker.walk():
+        file = Path(entry.path)
+        category = get_category(file)
+        target_folder = destination_folder / category
+        names = taken_names.get(target_folder)
+        if names is None:
+            names = set(os.listdir(target_folder)) if target_folder.is_dir() else set()
+            taken_names[target_folder] = names
+        if category == 'Archives':
+            # archives with the same name are unpacked into the same folder
+            name = normalize(file.name.replace(file.suffix,''))
+            collision = name in names
+        else:
+            name = normalize(file.name)
+            collision = name in names
+            name = get_free_name(target_folder, name, names).name
+        names.add(name)
+        plan.append({
+            'source': str(file),
+            'destination': str(target_folder / name),
+            'category': category,
+            'bytes': entry.stat(follow_symlinks=False).st_size,
+            'collision': collision,
+            'duplicate_of': None,
+            'action': 'move',
+        })
+    if dedup:
+        mark_duplicates(plan, [destination_folder / folder for folder in CATEGORY_FOLDERS], dedup)
+    return plan
+
+def hash_file(file: str, partial=False) -> bytes:
+    # partial: only the beginning and the end of the file are hashed
+    file_hash = hashlib.blake2b()
+    with open(file, 'rb') as f:
+        if partial:
+            file_hash.update(f.read(PARTIAL_HASH_SIZE))
+            f.seek(max(os.fstat(f.fileno()).st_size - PARTIAL_HASH_SIZE, 0))
+            file_hash.update(f.read(PARTIAL_HASH_SIZE))
+        else:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                file_hash.update(chunk)
+    return file_hash.digest()
+
+def find_duplicates(files: list, wanted=None) -> list:
+    # files: (path, size); only the files of the same size are read, most files are excluded by the partial hash
+    # wanted: if given, only the groups with one of these files are searched, the others are not read
+    groups = {}
+    for file, size in files:
+        groups.setdefault(size, []).append(file)
+    for get_key in (lambda file: hash_file(file, partial=True), hash_file):
+        new_groups = {}
+        for key, group in groups.items():
+            if len(group) < 2 or wanted is not None and not any(file in wanted for file in group):
+                continue
+            if get_key is hash_file and key[0] <= 2 * PARTIAL_HASH_SIZE:
+                # the beginning and the end cover the whole file: the partial hash is the full one
+                new_groups[key] = group
+                continue
+            for file in group:
+                new_groups.setdefault((key, get_key(file)), []).append(file)
+        groups = new_groups
+    return [group for group in groups.values() if len(group) > 1]
+
+def mark_duplicates(plan: list, target_folders: list, mode: str) -> None:
+    # the first copy is kept: the files in the target folders, then the files in the order of the plan
+    if mode not in DEDUP_MODES:
+        raise ValueError(f'Unknown mode of duplicate detection: {mode}')
+    files = []
+    for target_folder in target_folders:
+        if target_folder.is_dir() and target_folder.name != 'Archives':
+            with os.scandir(target_folder) as entries:
+                files.extend(
+                    (entry.path, entry.stat().st_size) for entry in entries if entry.is_file(follow_symlinks=False)
+                )
+    # archives are unpacked, so they are not compared
+    entries = {entry['source']: entry for entry in plan if entry['category'] != 'Archives'}
+    files.extend((source, entry['bytes']) for source, entry in entries.items())
+    # the files already in the target folders are compared only with the files of the plan
+    for group in find_duplicates(files, entries):
+        original = entries[group[0]]['destination'] if group[0] in entries else group[0]
+        for file in group[1:]:
+            entry = entries.get(file)
+            if entry is None:  # a duplicate already in a target folder is left as it is
+                continue
+            entry['duplicate_of'] = original
+            if mode != 'report':
+                entry['action'] = mode
+
+def get_moved_files(plan: list):
+
+    return (entry['source'] for entry in plan if entry['action'] != 'skip')
+
+def move_file(source: str, destination: str, original=None) -> str:
+    # the file is linked and then removed from the source folder: unlike os.replace, os.link does not
+    # overwrite a file created in the destination folder after the planning, the next free name is taken then
+    # original: if given, the destination becomes a hard link to it instead of the source
+    target_folder = Path(destination).parent
+    while True:
         try:
-            target_folder = destination_folder / DIRECTORY_NAME[ext.upper()]
-            transfer_file(file, target_folder)
-        except KeyError:
-            target_folder = destination_folder / 'Others'
-            transfer_file(file, target_folder)
+            if original is None:
+                os.link(source, destination, follow_symlinks=False)
+            else:
+                os.link(original, destination)
+            break
+        except FileExistsError:
+            with get_folder_lock(target_folder):
+                destination = str(get_free_name(target_folder, os.path.basename(destination)))
+        except OSError:  # no hard links, e.g. another file system: the free name is checked under the lock
+            with get_folder_lock(target_folder):
+                destination = str(get_free_name(target_folder, os.path.basename(destination)))
+                os.replace(source, destination)
+            return destination
+    os.remove(source)
+    return destination
+
+def execute_plan(plan: list, workers=1, archive_workers=0) -> int:
+    # phase two: the files are moved grouped by the target folder, each folder is created once
+    groups = {}
+    for entry in plan:
+        groups.setdefault(os.path.dirname(entry['destination']), []).append(entry)
+    for target_folder in groups:
+        os.makedirs(target_folder, exist_ok=True)
+    extractor = ArchiveExtractor(archive_workers) if archive_workers > 0 else None
+    renamed = {}  # destination in the plan -> name taken instead (the planned name was taken meanwhile)
+
+    def execute_entries(entries: list) -> None:
+        for entry in entries:
+            if entry['category'] == 'Archives':
+                file = Path(entry['source'])
+                target_folder = Path(entry['destination']).parent
+                if extractor is not None:
+                    extractor.submit(file, target_folder)
+                else:
+                    handle_archive(file, target_folder)
+            elif entry['action'] == 'move':
+                destination = move_file(entry['source'], entry['destination'])
+                if destination != entry['destination']:
+                    renamed[entry['destination']] = destination
+                    entry['destination'] = destination
+
+    try:
+        if workers <= 1:
+            for entries in groups.values():
+                execute_entries(entries)
+        else:
+            # the names in the plan are unique, so the parts of one folder can be moved concurrently
+            parts = []
+            for entries in groups.values():
+                size = -(-len(entries) // workers)
+                parts.extend(entries[i:i + size] for i in range(0, len(entries), size))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for _ in executor.map(execute_entries, parts):
+                    pass
+    finally:
+        # the archives submitted before an error are still unpacked and the processes are stopped
+        if extractor is not None:
+            extractor.finish()
+    # the hard links are made when all original files are in place
+    for entry in plan:
+        if entry['action'] == 'hardlink':
+            entry['duplicate_of'] = renamed.get(entry['duplicate_of'], entry['duplicate_of'])
+            entry['destination'] = move_file(entry['source'], entry['destination'], entry['duplicate_of'])
+    return sum(entry['action'] != 'skip' for entry in plan)
+
+def dump_plan(plan: list, filename: str) -> None:
+
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump(plan, file, ensure_ascii=False, indent=1)
+
+def summarize_plan(plan: list) -> str:
+
+    summary = {}
+    for entry in plan:
+        files, size, collisions, duplicates = summary.get(entry['category'], (0, 0, 0, 0))
+        summary[entry['category']] = (
+            files + 1,
+            size + entry['bytes'],
+            collisions + entry['collision'],
+            duplicates + (entry['duplicate_of'] is not None),
+        )
+    lines = [f"{'category':<10} | {'files':>8} | {'bytes':>14} | {'collisions':>10} | {'duplicates':>10}"]
+    for category, (files, size, collisions, duplicates) in sorted(summary.items()):
+        lines.append(f'{category:<10} | {files:>8} | {size:>14} | {collisions:>10} | {duplicates:>10}')
+    return '\n'.join(lines)
+
+class FolderWalker:
+    """
+    Walks a folder tree without recursion and counts the entries of each folder,
+    so the folders left empty after the sorting are removed bottom-up without walking the tree again.
+    """
+
+    def __init__(self, root: Path):
+        self.root = str(root)
+        self.remaining = {}  # folder -> number of entries which were not moved out
+        self.parents = {}  # folder -> parent folder
+
+    def walk(self):
+        # yields os.DirEntry objects of the files: their type is known without an extra stat
+        # symbolic links are left in place (they are counted, so their folders are not removed)
+        folders = [self.root]
+        while folders:
+            folder = folders.pop()
+            count = 0
+            subfolders = []
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    count += 1
+                    if entry.is_symlink():
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in CATEGORY_FOLDERS:
+                            self.parents[entry.path] = folder
+                            subfolders.append(entry.path)
+                    else:
+                        yield entry
+            self.remaining[folder] = count
+            # the subfolders are walked in the order of the listing
+            folders.extend(reversed(subfolders))
+
+    def remove_empty_folders(self, moved_files) -> None:
+        """
+        Removes the folders which became empty when the files were moved out and the folders which were empty
+        before (or contained only empty folders).
+        :param moved_files: paths of the files moved out of the tree.
+        """
+        for file in moved_files:
+            self.remaining[os.path.dirname(file)] -= 1
+        # the removal starts in every empty folder and goes up while the parents become empty
+        for folder in [folder for folder, count in self.remaining.items() if not count]:
+            while os.path.basename(folder) not in CATEGORY_FOLDERS:
+                try:
+                    os.rmdir(folder)
+                except OSError:  # new entries were created in the folder (e.g. the destination folder)
+                    break
+                if folder == self.root:
+                    break
+                folder = self.parents[folder]
+                self.remaining[folder] -= 1
+                if self.remaining[folder]:
+                    break
 
 def normalize(element: str) -> str:
     
@@ -71,14 +444,25 @@ def normalize(element: str) -> str:
     element_trans = re.sub(r'\W^\.', '_', element_trans)    
     return element_trans
 
-def transfer_file(file: Path, target_folder: Path) -> None:
-    target_folder.mkdir(exist_ok=True, parents=True)
-    ext = file.suffix[1:].upper()
-    if ext in DIRECTORY_NAME and DIRECTORY_NAME[ext] == 'Archives':
-        handle_archive(file, target_folder)
-    else:
-        file.replace(target_folder / normalize(file.name))
-       
+def get_folder_lock(folder: Path) -> threading.Lock:
+    with FOLDER_LOCKS_LOCK:
+        return FOLDER_LOCKS.setdefault(folder, threading.Lock())
+
+def get_free_name(target_folder: Path, name: str, names=None) -> Path:
+    # a file with the same name is not overwritten: the new file gets the name "<name>_<n>.<ext>"
+    # names: names taken in the folder, if None, the folder is checked
+    def is_taken(target: Path) -> bool:
+        return target.name in names if names is not None else target.exists()
+
+    target = target_folder / name
+    stem, dot, ext = name.rpartition('.')
+    if not dot:
+        stem, ext = name, ''
+    n = 1
+    while is_taken(target):
+        target = target_folder / f'{stem}_{n}{dot}{ext}'
+        n += 1
+    return target
 
 def rename_files_and_folders(path: Path) -> None:
     
@@ -94,23 +478,13 @@ def handle_archive(file: Path, target_folder: Path) -> None:
     
     archive_name = normalize(file.name.replace(file.suffix,''))
     folder_for_file = target_folder / archive_name
-    folder_for_file.mkdir(exist_ok=True, parents=True)
-    try:
-        shutil.unpack_archive(file, folder_for_file)
-        rename_files_and_folders(folder_for_file)
-    except shutil.ReadError:
-        print('It is not archive')
-        folder_for_file.rmdir()
+    # archives with the same name are unpacked into the same folder one after another
+    with get_folder_lock(folder_for_file):
+        folder_for_file.mkdir(exist_ok=True, parents=True)
+        try:
+            shutil.unpack_archive(file, folder_for_file)
+            rename_files_and_folders(folder_for_file)
+        except shutil.ReadError:
+            print('It is not archive')
+            folder_for_file.rmdir()
     file.unlink()
-
-
-def handle_empty_folders(path: Path) -> None:
-    for cur_dir, subdirs, files in os.walk(path, topdown=False):
-                # print(cur_dir, subdirs, files)
-                for subdir in subdirs:
-                    if not os.listdir(os.path.join(cur_dir, subdir)) and not subdir in ('Archives', 'Video', 'Audio', 'Documents', 'Images', 'Others'):
-                        # print(f'removing {subdir}')
-                        os.rmdir(os.path.join(cur_dir, subdir))
-    if not os.listdir(cur_dir) and not Path(cur_dir).name in ('Archives', 'Video', 'Audio', 'Documents', 'Images', 'Others'):
-        # print(f'removing {cur_dir}')
-        os.rmdir(cur_dir)
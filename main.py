@@ -1,12 +1,32 @@
-# from .address_book.main import main as ab
-from address_book.main import main as ab
+from dispatcher import CommandTrie
 
-# from .note_book.main import main as nb
-from note_book.main import main as nb
+# The subsystems and prettytable are imported only when their menu entry is chosen
+# (see startup_benchmark.py for the start-up time budget).
+MENU_OPTIONS = [
+    ("1", "Address Book"),
+    ("2", "Note Book"),
+    ("3", "File Sorter"),
+    ("4", "Commands Description"),
+    ("5", "EXIT"),
+]
 
-# from .file_sorter.main import main as fs
-from file_sorter.main import main as fs
-import prettytable
+
+def ab():
+    from address_book.main import main
+
+    return main()
+
+
+def nb():
+    from note_book.main import main
+
+    return main()
+
+
+def fs():
+    from file_sorter.main import main
+
+    return main()
 
 
 def hello_handler():
@@ -18,17 +38,20 @@ def exit_handler():
 
 
 def menu():
-    x = prettytable.PrettyTable()
-    x.header = False
-    x.add_row(["1", "Address Book"], divider=True)
-    x.add_row(["2", "Note Book"], divider=True)
-    x.add_row(["3", "File Sorter"], divider=True)
-    x.add_row(["4", "Commands Description"], divider=True)
-    x.add_row(["5", "EXIT"], divider=True)
-    return x
+    # the same table as prettytable.PrettyTable without a header renders, built without importing prettytable
+    width = max(len(name) for _, name in MENU_OPTIONS)
+    divider = f"+---+{'-' * (width + 2)}+"
+    rows = [divider]
+    for key, name in MENU_OPTIONS:
+        left = (width - len(name)) // 2
+        rows.append(f"| {key} | {' ' * left}{name}{' ' * (width - len(name) - left)} |")
+        rows.append(divider)
+    return "\n".join(rows)
 
 
 def commands_descr():
+    import prettytable
+
     x = prettytable.PrettyTable()
     x.field_names = ["1", "ADDRESS BOOK"]
     x.align["ADDRESS BOOK"] = "l"
@@ -53,6 +76,8 @@ def commands_descr():
             ["store", "to store current address book into a file"],
             ["load", "to load an address book from a file"],
             ["new profile", "to create a new empty address book"],
+            ["import", "to import contacts from a CSV or vCard file"],
+            ["export", "to export contacts into a CSV or JSON Lines file"],
             [
                 "good bye, close, exit, mainmenu",
                 "to exit the Address Book and go back to the main menu",
@@ -68,10 +93,11 @@ def commands_descr():
             ["add", "to creat a note"],
             ["edit", "to edit a note"],
             ["show", "to show a note"],
-            ["show_all", "to show list of all notes"],
+            ["show_all", "to show list of all notes (page by page, ordered by name or tag)"],
             ["delete", "to delete a note"],
             ["search", "to find notes with a keyword"],
-            ["search", "to find all notes by tag"],
+            ["search_by", "to find all notes by tag (tags can be combined with AND, OR, NOT)"],
+            ["tags", "to show all tags with the number of notes"],
             ["add_tag", "to add tag to a note"],
             ["del_tag", "to delete a tag from a note"],
             ["help", "to call commands description"],
@@ -102,11 +128,13 @@ COMMANDS = {
 }
 
 
+COMMAND_TRIE = CommandTrie(COMMANDS)
+
+
 def command_parser(raw_str: str):
-    elements = raw_str.split()
-    for key, value in COMMANDS.items():
-        if (raw_str.lower() in value) or (elements and elements[0].lower() in value):
-            return key
+    func, _ = COMMAND_TRIE.parse(raw_str)
+    if func:
+        return func
     return 'Invalid command. Please, try again. To see valid options type "menu".'
 
 
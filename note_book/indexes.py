@@ -0,0 +1,233 @@
+"""
+These classes are required to perform fast searches of notes in the note book.
+"""
+from collections import Counter
+import bisect
+import math
+import re
+
+TOKEN_PATTERN = re.compile(r'\w+')
+# words of a query which select how the terms are combined (case sensitive, so the words can be searched too)
+AND, OR = 'AND', 'OR'
+
+
+class TextIndex:
+    """
+    Inverted index of the note texts: term -> names of the notes containing it with the term frequencies.
+    A query term matches all terms starting with it (found by binary search in the sorted list of the terms).
+    The search results are ranked by BM25.
+    """
+
+    K1 = 1.2  # saturation of the term frequency
+    B = 0.75  # normalization by the note length
+
+    @staticmethod
+    def tokenize(text: str) -> list:
+        return TOKEN_PATTERN.findall(text.lower())
+
+    def __init__(self):
+        self.postings = {}  # term -> {name: term frequency}
+        self.lengths = {}  # name -> number of terms in the note
+        self.terms = {}  # name -> unique terms of the note (to remove the note from the postings)
+        self.sorted_terms = []  # all terms of the postings, sorted for the prefix lookup
+        self.total_length = 0
+
+    def add(self, name: str, text: str):
+        """
+        Adds the note to the index (the previous text of the note is removed from the index).
+        :param name: name of the note.
+        :param text: text of the note.
+        :return: None.
+        """
+        self.remove(name)
+        terms = self.tokenize(text)
+        frequencies = Counter(terms)
+        for term, frequency in frequencies.items():
+            names = self.postings.get(term)
+            if names is None:
+                names = self.postings[term] = {}
+                if self.sorted_terms is not None:
+                    bisect.insort(self.sorted_terms, term)
+            names[name] = frequency
+        self.terms[name] = tuple(frequencies)
+        self.lengths[name] = len(terms)
+        self.total_length += len(terms)
+
+    def remove(self, name: str):
+        """
+        Removes the note from the index.
+        :param name: name of the note.
+        :return: None.
+        """
+        length = self.lengths.pop(name, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in self.terms.pop(name):
+            names = self.postings[term]
+            del names[name]
+            if not names:
+                del self.postings[term]
+                if self.sorted_terms is not None:
+                    del self.sorted_terms[bisect.bisect_left(self.sorted_terms, term)]
+
+    def rebuild(self, notes):
+        """
+        Builds the index anew.
+        :param notes: iterable with tuples (name, text).
+        :return: None.
+        """
+        self.postings = {}
+        self.lengths = {}
+        self.terms = {}
+        self.total_length = 0
+        self.sorted_terms = None  # sorted once at the end instead of inserting every new term
+        for name, text in notes:
+            self.add(name, text)
+        self.sorted_terms = sorted(self.postings)
+
+    def get_postings(self, prefix: str) -> dict:
+        """
+        Merges the postings of all terms starting with the prefix.
+        :param prefix: query term.
+        :return: dictionary {name: total frequency of the matching terms in the note}.
+        """
+        res = {}
+        idx = bisect.bisect_left(self.sorted_terms, prefix)
+        while idx < len(self.sorted_terms) and self.sorted_terms[idx].startswith(prefix):
+            for name, frequency in self.postings[self.sorted_terms[idx]].items():
+                res[name] = res.get(name, 0) + frequency
+            idx += 1
+        return res
+
+    def parse_query(self, query: str) -> tuple:
+        """
+        Splits the query into terms. The terms are combined with AND unless the query contains the word OR.
+        :param query: query, e.g. 'meeting budget' or 'meeting OR budget'.
+        :return: tuple (list of unique terms, True for OR semantics).
+        """
+        words = query.split()
+        use_or = OR in words
+        terms = []
+        for word in words:
+            if word not in (AND, OR):
+                terms.extend(self.tokenize(word))
+        return list(dict.fromkeys(terms)), use_or
+
+    def search(self, query: str) -> list:
+        """
+        Finds the notes matching the query. Each query term matches the words starting with it, e.g. 'meet' matches
+        'meeting'. Parts of words in the middle or at the end of a word are not found.
+        :param query: query, e.g. 'meeting budget' (all terms) or 'meeting OR budget' (any term).
+        :return: names of the notes, the most relevant first.
+        """
+        terms, use_or = self.parse_query(query)
+        postings = [self.get_postings(term) for term in terms]
+        if not postings:
+            return []
+        if use_or:
+            candidates = set().union(*postings)
+        else:
+            # intersection starting with the rarest term
+            postings_by_size = sorted(postings, key=len)
+            candidates = set(postings_by_size[0])
+            for names in postings_by_size[1:]:
+                candidates.intersection_update(names)
+                if not candidates:
+                    return []
+        n_notes = len(self.lengths)
+        avg_length = self.total_length / n_notes if n_notes else 0
+        scores = dict.fromkeys(candidates, 0.0)
+        for names in postings:
+            idf = math.log(1 + (n_notes - len(names) + 0.5) / (len(names) + 0.5))
+            for name in candidates:
+                frequency = names.get(name)
+                if frequency:
+                    norm = 1 - self.B + self.B * self.lengths[name] / avg_length if avg_length else 1
+                    scores[name] += idf * frequency * (self.K1 + 1) / (frequency + self.K1 * norm)
+        return sorted(scores, key=lambda name: (-scores[name], name))
+
+
+class TagIndex:
+    """
+    Index of the tags: tag -> names of the notes with the tag.
+    """
+
+    NOT = 'NOT'
+
+    def __init__(self):
+        self.data = {}  # tag -> names of the notes (dict is used as an ordered set)
+
+    def add(self, tag: str, name: str):
+        self.data.setdefault(tag, {})[name] = None
+
+    def remove(self, tag: str, name: str):
+        names = self.data.get(tag)
+        if names is None:
+            return
+        names.pop(name, None)
+        if not names:
+            del self.data[tag]
+
+    def rebuild(self, notes):
+        """
+        Builds the index anew.
+        :param notes: iterable with tuples (name, tags).
+        :return: None.
+        """
+        self.data = {}
+        for name, tags in notes:
+            for tag in tags:
+                self.add(tag, name)
+
+    def get_counts(self) -> dict:
+        """
+        Counts the notes with each tag.
+        :return: dictionary {tag: number of notes}, the most frequent tags first.
+        """
+        counts = {tag: len(names) for tag, names in self.data.items()}
+        return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+    def parse_query(self, query: str) -> list:
+        """
+        Splits the query into groups combined with OR, each group is a list of tags
+        combined with AND, the tags preceded by NOT are excluded. A tag can consist of several words.
+        :param query: query, e.g. 'work AND urgent NOT done OR private'.
+        :return: list of tuples (tags to include, tags to exclude).
+        """
+        groups = [([], [])]
+        words = []
+        exclude = False
+        for word in query.split() + [AND]:
+            if word not in (AND, OR, self.NOT):
+                words.append(word)
+                continue
+            if words:
+                groups[-1][exclude].append(' '.join(words))
+                words = []
+            exclude = word == self.NOT
+            if word == OR:
+                groups.append(([], []))
+        return [group for group in groups if group != ([], [])]
+
+    def search(self, query: str, all_names) -> list:
+        """
+        Finds the notes matching the query. Without the operators the whole query is one tag.
+        :param query: query, e.g. 'work AND urgent NOT done OR private'.
+        :param all_names: names of all notes (needed only if a group has no tags to include).
+        :return: names of the notes.
+        """
+        res = {}
+        for include, exclude in self.parse_query(query):
+            if include:
+                names_by_size = sorted((self.data.get(tag, {}) for tag in include), key=len)
+                matches = {name: None for name in names_by_size[0]}
+                for names in names_by_size[1:]:
+                    matches = {name: None for name in matches if name in names}
+            else:
+                matches = dict.fromkeys(all_names)
+            excluded = [self.data.get(tag, {}) for tag in exclude]
+            res.update(
+                (name, None) for name in matches if not any(name in names for names in excluded)
+            )
+        return list(res)
@@ -1,13 +1,23 @@
 from collections import UserDict
 from operator import attrgetter
+import atexit
+import bisect
+import heapq
+import itertools
+import os
 import pickle
+import threading
 import prettytable
+from dispatcher import CommandTrie
+from note_book.indexes import TagIndex, TextIndex
 
 FILENAME = './note_book/notebook.pkl'
+# changes made within this interval (in seconds) are written to the file at once, 0 - write every change
+FLUSH_INTERVAL = 2.0
 COMMANDS = (
     'add <name>', 'edit <name>', 'show <name>',
-    'show_all', 'delete <name>', 'search <keyword>',
-    'search_by <tag>', 'add_tag <name>', 'del_tag <name>', 'help', 'exit'
+    'show_all (<n>) (-name|-tag)', 'delete <name>', 'search <keyword> ...',
+    'search_by <tag>', 'tags', 'add_tag <name>', 'del_tag <name>', 'help', 'exit'
       )
 
 DESCRIPTION = (
@@ -16,10 +26,14 @@ and add it to the Note Book. You will be prompted \
 to enter the note text under the name.',
     'to edit a note with the name <name>.',
     'to show a note with the name <name>.',
-    'to show list of all notes.',
+    'to show list of all notes, optionally <n> notes per page \
+and ordered by name or tags.',
     'to delete a note with the name <name>.',
-    'to find notes with a keyword <keyword>.',
-    'to find all notes by tag <tag>.',
+    'to find notes with all keywords <keyword> (or any of them if separated by OR), \
+the most relevant notes first. A keyword also finds the words starting with it.',
+    'to find all notes by tag <tag>. Tags can be combined \
+with AND, OR and NOT, e.g. "work AND urgent NOT done".',
+    'to show all tags with the number of notes.',
     'to add tag to a note with the name <name>. \
 You can enter multiple tags separated by ", "',
     'to delete a tag from a note with the name <name>. \
@@ -30,9 +44,20 @@ You will be promted to select a tag to delete.',
 
 
 class Note:
+    owner = None  # record the note belongs to (not stored)
+
     def __init__(self):
         self.__value = None
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('owner', None)
+        return state
+
+    def changed(self):
+        if self.owner is not None:
+            self.owner.changed(text_changed=True)
+
     def is_valid(self, new_value: str):
         return len(new_value) > 2
 
@@ -46,56 +71,145 @@ class Note:
             raise ValueError('Note is too short')
         else:
             self.__value = new_value
+            self.changed()
 
 
 class Record:
+    owner = None  # note book the record belongs to (not stored)
+
     def __init__(self, name: str, note: Note, tags=None):
         if name:
             self.name = name
         else:
             raise ValueError('Name is too short')
         self.note = note
-        self.tags = []
+        self.note.owner = self
+        self.tags = []  # sorted, without duplicates
         if tags:
-            self.tags.extend(list(set(tags.split(', '))))
-            self.tags = sorted(self.tags)
+            self.tags = sorted(set(tags.split(', ')))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('owner', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.note.owner = self
+
+    def changed(self, text_changed=False, added_tags=(), removed_tags=()):
+        if self.owner is not None:
+            self.owner.changed(self, text_changed, added_tags, removed_tags)
+
+    def has_tag(self, tag: str) -> bool:
+        idx = bisect.bisect_left(self.tags, tag)
+        return idx < len(self.tags) and self.tags[idx] == tag
 
     def add_tag(self, tags: str):
-        tags = list(set(tags.split(', ')))
+        tags = sorted(set(tags.split(', ')))
         for tag in tags:
-            if tag in self.tags:
+            if self.has_tag(tag):
                 print(f'Tag "{tag}" already exists')
             else:
-                self.tags.append(tag)
-                self.tags = sorted(self.tags)
+                bisect.insort(self.tags, tag)
+                self.changed(added_tags=[tag])
 
     def delete_tag(self, tag: str):
-        if tag in self.tags:
-            self.tags.remove(tag)
+        if self.has_tag(tag):
+            self.tags.pop(bisect.bisect_left(self.tags, tag))
+            self.changed(removed_tags=[tag])
         else:
             raise ValueError('Tag not found')
 
 
+class NBIterator:
+    """
+    Iterator over the notes of a note book, page by page. The notes are not copied:
+    they are taken from the collection (optionally ordered through a heap) page by page.
+    """
+
+    ORDERS = {
+        'name': lambda record: record.name,
+        'tag': lambda record: (record.tags, record.name),
+    }
+
+    def __init__(self, records, n=None, order=None):
+        """
+        :param records: collection of the records, e.g. dict values.
+        :param n: number of notes per page. If None, all notes are returned at once.
+        :param order: None (as added), 'name' or 'tag'.
+        """
+        if order is None:
+            self.cursor = iter(records)
+        else:
+            self.cursor = self.ordered(records, self.ORDERS[order])
+        self.n = n
+        self.start_idx = 0
+
+    @staticmethod
+    def ordered(records, key):
+        # heapify takes linear time, each page costs only O(n * log(len(records)))
+        heap = [(key(record), idx, record) for idx, record in enumerate(records)]
+        heapq.heapify(heap)
+        while heap:
+            yield heapq.heappop(heap)[-1]
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.cursor is None:
+            raise StopIteration
+        page = list(itertools.islice(self.cursor, self.n))
+        if not self.n:
+            self.cursor = None
+        if not page:
+            self.cursor = None
+            raise StopIteration
+        result = prettytable.PrettyTable()
+        result.field_names = ['#', 'Name', 'Tags']
+        result.align = 'l'
+        result._max_width = {'Name': 30, 'Tags': 30}
+        for idx, record in enumerate(page, self.start_idx + 1):
+            result.add_row([idx, record.name, ', '.join(record.tags)])
+        self.start_idx += len(page)
+        return result
+
+
 class NoteBook(UserDict):
+    # the methods changing the note book hold the lock, so the data are not written halfway through a change
     def add_note(self, name: str, value: str, tags: str):
         try:
             note = Note()
             note.value = value
             record = Record(name, note, tags)
-            self.data[record.name] = record
-            self.save_data()
+            with self.lock:
+                record.owner = self
+                if record.name in self.data:
+                    self.remove_tags(self.data[record.name])
+                self.data[record.name] = record
+                self.changed(record, text_changed=True, added_tags=record.tags)
         except ValueError as err:
             print(', '.join(err.args))
         
 
     def edit_note(self, name: str, new_note: str):
         try:
-            self.data[name].note.value = new_note
+            with self.lock:
+                self.data[name].note.value = new_note
         except KeyError:
             print('Note not found!')
         except ValueError:
             print('Note is too short')
 
+    def add_tag(self, name: str, tags: str):
+        with self.lock:
+            self.data[name].add_tag(tags)
+
+    def delete_tag(self, name: str, tag: str):
+        with self.lock:
+            self.data[name].delete_tag(tag)
+
     def show_note(self, name: str) -> str:
         try:
             note = prettytable.PrettyTable()
@@ -109,77 +223,118 @@ class NoteBook(UserDict):
 
     def delete_note(self, name: str):
         try:
-            self.data.pop(name)
+            with self.lock:
+                record = self.data.pop(name)
+                record.owner = None
+                self.remove_tags(record)
+                self.text_index.remove(name)
+                self.changed()
             print(f'Note with the name "{name}" succesufully deleted.')
         except KeyError:
             print('Note not found!')
 
     def search_note(self, query):
-        results = set()
         if query:
-            for record in self.data.values():
-                if query in record.note.value:
-                    results.add(record)
-
-            results = self.sort_notes(list(results))
-            return ', '.join(note.name for note in results)
+            return ', '.join(self.text_index.search(query))
         return 'No value to search'
 
     def search_by_tag(self, query: str) -> str:
-        matches = set()
         result = prettytable.PrettyTable()
         result.field_names = ['Name', 'Tags']
         result._max_width = {'Name': 30, 'Tags': 20}
         if query:
-            for record in self.data.values():
-                if any(query == tag for tag in record.tags):
-                    matches.add(record)
-
-            matches = self.sort_notes(list(matches))
+            matches = [self.data[name] for name in self.tag_index.search(query, self.data)]
+            if not matches:
+                return ''
+            matches = self.sort_notes(matches)
             for record in matches:
                 result.add_row([record.name, ', '.join(record.tags)])
             return result
         return 'No value to search'
 
-    def show_all_notes(self):
+    def show_tags(self):
         result = prettytable.PrettyTable()
-        result.align = 'l'
-        result.header = False
-        result.max_table_width = 30
-        result.add_row([', '.join(self.data.keys())])
+        result.field_names = ['Tag', 'Notes']
+        result.align['Tag'] = 'l'
+        for tag, count in self.tag_index.get_counts().items():
+            result.add_row([tag, count])
         return result
 
+    def remove_tags(self, record: Record):
+        for tag in record.tags:
+            self.tag_index.remove(tag, record.name)
+
+    def show_all_notes(self, n=None, order=None) -> NBIterator:
+        return NBIterator(self.data.values(), n, order)
+
     def sort_notes(self, notes:list[Note]):
         return sorted(notes, key=attrgetter('tags'))
 
+    def changed(self, record=None, text_changed=False, added_tags=(), removed_tags=()):
+        with self.lock:
+            if record is not None:
+                if text_changed:
+                    self.text_index.add(record.name, record.note.value)
+                for tag in added_tags:
+                    self.tag_index.add(tag, record.name)
+                for tag in removed_tags:
+                    self.tag_index.remove(tag, record.name)
+            # the changes are coalesced: they are written by one flush after the flush interval
+            self.dirty = True
+            if not self.flush_interval:
+                self.flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.flush_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.dirty:
+                self.save_data()
+
     def save_data(self):
-        with open(FILENAME, 'wb') as file:
-            pickle.dump(self.data, file)
+        # atomic write: the file is replaced only by a completely written temporary file
+        with self.lock:
+            tmp_filename = self.filename + '.tmp'
+            with open(tmp_filename, 'wb') as file:
+                pickle.dump(self.data, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_filename, self.filename)
+            self.dirty = False
 
     def load_data(self):
         try:
-            with open(FILENAME, 'rb') as file:
+            with open(self.filename, 'rb') as file:
                 self.data = pickle.load(file)
         except FileNotFoundError:
             self.data = {}
+        for record in self.data.values():
+            record.owner = self
+        self.text_index.rebuild((record.name, record.note.value) for record in self.data.values())
+        self.tag_index.rebuild((record.name, record.tags) for record in self.data.values())
+        self.dirty = False
 
-    def __init__(self):
+    def __init__(self, filename=FILENAME, flush_interval=FLUSH_INTERVAL):
         super().__init__(self)
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.dirty = False
+        self.lock = threading.RLock()
+        self.timer = None
+        self.text_index = TextIndex()
+        self.tag_index = TagIndex()
         self.load_data()
+        atexit.register(self.flush)  # pending changes are written even if the programme is interrupted
 
     def __iter__(self):
-        self.idx = 0
-        return self
+        return iter(self.data.values())
 
-    def __next__(self):
-        if self.idx < len(self.data):
-            keys = list(self.data.keys())
-            key = keys[self.idx]
-            self.idx += 1
-            return self.data[key]
-        else:
-            raise StopIteration
-note_book = NoteBook()
+note_book = None  # the notes are loaded from the file when the Note Book is entered
 
 def command_list():
     description = prettytable.PrettyTable()
@@ -199,76 +354,132 @@ def command_parser(raw_input: str):
         name = ' '.join(user_input[1:])
     return (command, name)
 
-def command_handler(command: str, name: str):
-    if command == 'add':
+def add_handler(name: str):
+    if name in note_book.keys():
+        print('Note already exist')
+    else:
+        value = input('Enter your note:\n')
+        tags = input('Put some tags: ')
+        note_book.add_note(name, value, tags)
         if name in note_book.keys():
-            print('Note already exist')
-        else:
-            value = input('Enter your note:\n')
-            tags = input('Put some tags: ')
-            note_book.add_note(name, value, tags)
-            if name in note_book.keys():
-                print(f'Note with the name "{name}" succesufully added.')
+            print(f'Note with the name "{name}" succesufully added.')
 
-    elif command == 'edit':
-        value = input('Enter your note:\n')
-        note_book.edit_note(name, value)
-        if note_book[name].note.value == value:
-            print(f'Note with the name "{name}" has been edited.')
 
-    elif command == 'show':
-        note_book.show_note(name)
+def edit_handler(name: str):
+    value = input('Enter your note:\n')
+    note_book.edit_note(name, value)
+    if note_book[name].note.value == value:
+        print(f'Note with the name "{name}" has been edited.')
 
-    elif command == 'show_all':
-        print(note_book.show_all_notes())
 
-    elif command == 'delete':
-        note_book.delete_note(name)
+def show_handler(name: str):
+    note_book.show_note(name)
 
-    elif command == 'help':
-        print(command_list())
 
-    elif command == 'search':
-        result = note_book.search_note(name)
-        if result:
-            print(result)
+def show_all_handler(name: str):
+    n, order = None, None
+    for arg in name.split():
+        if arg.isdigit() and int(arg) > 0:
+            n = int(arg)
+        elif arg.lower().lstrip('-') in NBIterator.ORDERS:
+            order = arg.lower().lstrip('-')
         else:
-            print(f'Note that contains {name} not found!')
+            print(f'Unknown parameter "{arg}" (ignored).')
+    if not note_book.data:
+        print('Note Book is empty.')
+        return
+    for page in note_book.show_all_notes(n, order):
+        print(page)
+        if not n:
+            break
+        answer = input('Show more? ([y/n]): ')
+        while not (answer.startswith('y') or answer.startswith('n')):
+            answer = input("Please, enter one of the options: 'y' to show more notes, 'n' to finish.\n")
+        if answer.startswith('n'):
+            break
+    else:
+        print('No more notes found.')
 
-    elif command == 'search_by':
-        result = note_book.search_by_tag(name)
-        if result:
-            print(result)
-        else:
-            print(f'Notes with the {name} tag not found!')
 
-    elif command == 'add_tag':
-        if not name in note_book.keys():
-            print(f'Note with the name "{name}" does not exist.')
-        else:
-            tags = input('Enter tags to add:\n')
-            if tags:
-                note_book.data[name].add_tag(tags)
-                print(f'Tag(s) "{tags}" succesufully added to the note with the name "{name}".')
-            else:
-                print('Tag is too short')
+def delete_handler(name: str):
+    note_book.delete_note(name)
+
+
+def help_handler(name: str):
+    print(command_list())
+
+
+def search_handler(name: str):
+    result = note_book.search_note(name)
+    if result:
+        print(result)
+    else:
+        print(f'Note that contains {name} not found!')
+
 
-    elif command == 'del_tag':
-        if not name in note_book.keys():
-            print(f'Note with the name "{name}" does not exist.')
+def search_by_handler(name: str):
+    result = note_book.search_by_tag(name)
+    if result:
+        print(result)
+    else:
+        print(f'Notes with the {name} tag not found!')
+
+
+def tags_handler(name: str):
+    print(note_book.show_tags())
+
+
+def add_tag_handler(name: str):
+    if not name in note_book.keys():
+        print(f'Note with the name "{name}" does not exist.')
+    else:
+        tags = input('Enter tags to add:\n')
+        if tags:
+            note_book.add_tag(name, tags)
+            print(f'Tag(s) "{tags}" succesufully added to the note with the name "{name}".')
         else:
-            print(', '.join(note_book.data[name].tags))
-            tag = input('Choose tag to delete: ')
-            try:
-                note_book.data[name].delete_tag(tag)
-                print(f'Tag "{tag}" succesufully deleted from the note with the name "{name}".')
-            except ValueError as err:
-                print(', '.join(err.args))
+            print('Tag is too short')
 
+
+def del_tag_handler(name: str):
+    if not name in note_book.keys():
+        print(f'Note with the name "{name}" does not exist.')
+    else:
+        print(', '.join(note_book.data[name].tags))
+        tag = input('Choose tag to delete: ')
+        try:
+            note_book.delete_tag(name, tag)
+            print(f'Tag "{tag}" succesufully deleted from the note with the name "{name}".')
+        except ValueError as err:
+            print(', '.join(err.args))
+
+
+COMMAND_TRIE = CommandTrie({
+    add_handler: 'add',
+    edit_handler: 'edit',
+    show_handler: 'show',
+    show_all_handler: 'show_all',
+    delete_handler: 'delete',
+    help_handler: 'help',
+    search_handler: 'search',
+    search_by_handler: 'search_by',
+    tags_handler: 'tags',
+    add_tag_handler: 'add_tag',
+    del_tag_handler: 'del_tag',
+})
+
+
+def command_handler(command: str, name: str):
+    handler, _ = COMMAND_TRIE.match(command)
+    if handler:
+        handler(name)
     else:
         print('Unknown command')
 
 def main():
+    global note_book
+    if note_book is None:
+        note_book = NoteBook()
     print(command_list())
     print('You are in Note Book. How can I help you?')
     while True:
@@ -279,7 +490,7 @@ def main():
             break
         user_input = command_parser(user_input)
         command_handler(user_input[0].lower(), user_input[1])
-        note_book.save_data()
+    note_book.flush()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,55 @@
+"""
+Start-up time benchmark of the assistant (main.py).
+Imports main.py in fresh interpreters with 'python -X importtime', reports the cold-start time
+and the slowest imports, and checks the cold-start time against the budget.
+Run: python startup_benchmark.py (<runs>) (<budget, ms>)
+"""
+import os
+import subprocess
+import sys
+
+STARTUP_BUDGET_MS = 20  # target time of importing main.py (without the interpreter start-up)
+DEFAULT_RUNS = 5
+TOP_IMPORTS = 10
+
+
+def measure_startup() -> dict:
+    """
+    Imports main.py in a fresh interpreter.
+    :return: dictionary {module: cumulative import time in ms}.
+    """
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    # lines of the report: "import time: <self, us> | <cumulative, us> | <module>"
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, module = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            times[module.strip()] = int(cumulative) / 1000
+    return times
+
+
+def main(runs: int, budget: float) -> bool:
+    results = [measure_startup() for _ in range(runs)]
+    # the best run is the least disturbed by the rest of the system
+    best = min(results, key=lambda times: times["main"])
+    print(f"{'cumulative, ms':>14} | module")
+    top = sorted(best.items(), key=lambda item: item[1], reverse=True)[:TOP_IMPORTS]
+    for module, duration in top:
+        print(f"{duration:>14.1f} | {module}")
+    startup = best["main"]
+    print(f"Cold start: {startup:.1f} ms (best of {runs}), budget: {budget:.0f} ms")
+    return startup <= budget
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RUNS
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else STARTUP_BUDGET_MS
+    sys.exit(0 if main(runs, budget) else 1)
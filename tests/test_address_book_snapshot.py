@@ -0,0 +1,54 @@
+"""
+Storing and opening snapshots of the address book through the commands of the Address Book.
+Run: python -m unittest discover tests
+"""
+import os
+import tempfile
+import unittest
+
+import address_book.main as ab_main
+
+
+class SnapshotStoreTest(unittest.TestCase):
+    def setUp(self):
+        # the commands keep the address books in "./address_book/users"
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.backend = ab_main.STORAGE_BACKEND
+
+    def tearDown(self):
+        ab_main.STORAGE_BACKEND = self.backend
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def run_commands(self, *commands):
+        for command in commands:
+            res = ab_main.execute_command(command)
+            self.assertEqual(res["status"], "ok", f"{command}: {res['result']}")
+        return res
+
+    def check_store_exit_load(self, backend):
+        ab_main.STORAGE_BACKEND = backend
+        ab_main.new_profile_handler()
+        self.run_commands("add Alice +380501234567", "store -snapshot", "exit")
+        ab_main.new_profile_handler()
+        res = self.run_commands("load defaultuser -snapshot", "show all")
+        self.assertIn("Alice", res["result"])
+
+    def test_exit_keeps_snapshot(self):
+        self.check_store_exit_load("pickle")
+
+    def test_exit_keeps_snapshot_sqlite(self):
+        self.check_store_exit_load("sqlite")
+
+    def test_store_rewrites_snapshot(self):
+        ab_main.new_profile_handler()
+        self.run_commands("add Alice", "store -snapshot", "add Bob", "store")
+        ab_main.new_profile_handler()
+        res = self.run_commands("load defaultuser -snapshot", "show all")
+        self.assertIn("Bob", res["result"])
+
+
+if __name__ == "__main__":
+    unittest.main()